@@ -1,18 +1,34 @@
 import streamlit as st
 from datetime import datetime, timedelta
-from services.scoring import ProtocolScorer
+from services.protocol_index import ProtocolFeatureIndex
+from services.score_cache import ScoreCache
+from services.planning import generate_weekly_plan
 from services.data_service import PatientRepository, ProtocolRepository
+from services.cached_repository import CachedPatientRepository
+from services.data_db import get_engine
+from services.query_stats import instrument, track_queries
 from utils.clinical_scores import ClinicalScoresAnalyzer
+from utils.config import Settings
 from typing import Callable, Dict, List, Optional, Any
 
-# Initialize repositories
-patient_repo = PatientRepository()
+@st.cache_resource
+def get_patient_repository() -> CachedPatientRepository:
+    """Process-wide read-through cache over the patient repository, shared by every Streamlit session"""
+    repository = CachedPatientRepository(PatientRepository())
+    repository.listen()  # committed ORM writes invalidate the patients they touch
+    return repository
+
+# Initialize repositories (each call runs in its own session from the shared, pooled engine)
+patient_repo = get_patient_repository()
 protocol_repo = ProtocolRepository()
 
 if 'patients' not in st.session_state:
     st.session_state.patients = patient_repo.get_all_patient_ids()
 if 'protocols' not in st.session_state:
     st.session_state.protocols = protocol_repo.get_all_protocols()
+if 'protocol_index' not in st.session_state:
+    # Built once per catalog; scoring and planning read from it on every rerun
+    st.session_state.protocol_index = ProtocolFeatureIndex(st.session_state.protocols)
 if 'selected_patient' not in st.session_state:
     st.session_state.selected_patient = None
 if 'motor_weight' not in st.session_state:
@@ -22,45 +38,10 @@ if 'cognitive_weight' not in st.session_state:
 
 from typing import List, Dict
 
-def generate_weekly_plan(scored_protocols: List[Dict]) -> Dict[str, List[Dict]]:
-    """Distribute protocols across the week, balancing motor and cognitive activities."""
-    weekly_plan = {
-        "Monday": [],
-        "Tuesday": [],
-        "Wednesday": [],
-        "Thursday": [],
-        "Friday": [],
-        "Saturday": [],
-        "Sunday": []
-    }
-
-    # Separate motor and cognitive protocols
-    motor_protocols = [p for p in scored_protocols if p["type"] == "motor"]
-    cognitive_protocols = [p for p in scored_protocols if p["type"] == "cognitive"]
-
-    # Assign 4 activities per day, alternating motor and cognitive focus
-    for day in weekly_plan.keys():
-        # Alternate focus between motor and cognitive days
-        is_motor_day = list(weekly_plan.keys()).index(day) % 2 == 0
-
-        # Add 4 activities per day
-        while len(weekly_plan[day]) < 4:
-            if is_motor_day and motor_protocols:
-                weekly_plan[day].append(motor_protocols.pop(0))
-            elif cognitive_protocols:
-                weekly_plan[day].append(cognitive_protocols.pop(0))
-
-            # If no more protocols of the preferred type, use the other type
-            if is_motor_day and not motor_protocols and cognitive_protocols:
-                weekly_plan[day].append(cognitive_protocols.pop(0))
-            elif not cognitive_protocols and motor_protocols:
-                weekly_plan[day].append(motor_protocols.pop(0))
-
-            # Stop if no more protocols are available
-            if not motor_protocols and not cognitive_protocols:
-                break
-
-    return weekly_plan
+@st.cache_resource
+def get_score_cache() -> ScoreCache:
+    """Process-wide score cache shared by every Streamlit session"""
+    return ScoreCache(maxsize=512)
 
 def main():
 
@@ -81,14 +62,23 @@ def main():
         ["Patient Management", "Treatment Planning"]
     )
 
-    if page == "Patient Management":
-        patient_page()
-    elif page == "Protocol Recommendations":
-        pass
-    elif page == "Treatment Planning":
-        treatment_page()
-    else:
-        pass
+    if Settings.DEBUG_QUERIES:
+        instrument(get_engine())
+    with track_queries(page) as query_stats:
+        if page == "Patient Management":
+            patient_page()
+        elif page == "Protocol Recommendations":
+            pass
+        elif page == "Treatment Planning":
+            treatment_page()
+        else:
+            pass
+
+    if Settings.DEBUG_QUERIES:
+        # Queries issued by this render (cache hits issue none)
+        st.sidebar.caption(f"{query_stats.queries} queries, {query_stats.total_ms:.1f} ms in SQL")
+        for suspect in query_stats.suspected_n_plus_one():
+            st.sidebar.warning(f"Possible N+1: {suspect.count}x {suspect.statement[:120]}")
 
 def patient_page():
 
@@ -121,8 +111,9 @@ def patient_page():
             - **Motor Trajectory**: {patient.recovery_profile.motor_trajectory['slope']:.1f} pts/wk
         """)
 
-    # In the patient profile section
-    clinician_notes = st.text_area("Clinician Notes", value=patient.clinician_notes or "")
+    # Notes and tags are shown read-only: nothing writes them back to the database yet
+    st.text_area("Clinician Notes", value=patient.clinician_notes or "", disabled=True,
+                 key=f"clinician_notes_{patient_id}")
 
     # Display ARAT radar plot
     analyzer = ClinicalScoresAnalyzer()
@@ -137,15 +128,14 @@ def patient_page():
         moca_fig = analyzer.create_moca_radar(patient.clinical_scores.MoCA)
         st.pyplot(moca_fig, use_container_width=True)
 
-    tags = st.multiselect(
+    st.multiselect(
         "Tags",
-        options=["mild_neglect", "low_motivation", "prefers_gamification", "high_risk"],
-        default=patient.tags or []
+        options=sorted({"mild_neglect", "low_motivation", "prefers_gamification", "high_risk", *(patient.tags or [])}),
+        default=patient.tags or [],
+        disabled=True,
+        key=f"tags_{patient_id}"
     )
-
-    # Update patient object
-    patient.clinician_notes = clinician_notes
-    patient.tags = tags
+    st.caption("Clinician notes and tags are read-only in this demo.")
 
     # Motor/Cognitive Progress Chart
     st.subheader("Recovery Trajectory")
@@ -170,10 +160,11 @@ def treatment_page():
     # Generate recommendations
     patient_id = st.session_state.selected_patient
     patient = patient_repo.get_patient(patient_id)
-    protocols = st.session_state.protocols
+    protocol_index = st.session_state.protocol_index
 
-    scorer = ProtocolScorer(patient, protocols)
-    scored_protocols = scorer.score_all_protocols(st.session_state.motor_weight, st.session_state.cognitive_weight)
+    scored_protocols = get_score_cache().get_or_score(
+        patient, protocol_index, st.session_state.motor_weight, st.session_state.cognitive_weight
+    )
     weekly_plan = generate_weekly_plan(scored_protocols)
 
     # Display weekly plan
@@ -213,8 +204,8 @@ def handle_session_log(patient, protocol):
     st.success(f"Session logged for {protocol['name']}")
 
 def save_session_data(patient_id, day, mood, adherence):
-    # Implementation for saving session data
-    st.toast(f"Session data saved for {day}")
+    # Nothing stores session feedback yet, so there is no cached patient data to invalidate either
+    st.info(f"Session feedback for {day} is not stored in this demo.")
 
 if __name__ == "__main__":
     st.set_page_config(page_title="RecSYS Demo")
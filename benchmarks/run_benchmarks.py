@@ -0,0 +1,166 @@
+# benchmarks/run_benchmarks.py
+"""
+Scoring and planning benchmarks over synthetic cohorts.
+
+    python -m benchmarks.run_benchmarks --patients 10000 --protocols 500 --output bench.json
+    python -m benchmarks.run_benchmarks --patients 10000 --protocols 500 --baseline bench.json
+
+With --baseline the run is compared case by case and the process exits with
+status 1 when any metric regressed beyond --tolerance.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from models.patient import Patient, ProtocolRegistry
+from services.planning import generate_weekly_plan
+from services.protocol_index import ProtocolFeatureIndex
+from services.scoring import CohortScorer, ProtocolScorer, filter_protocols
+from utils.config import Settings
+from utils.mock_data import generate_random_history, generate_random_patient, generate_random_protocol
+
+MOTOR_WEIGHT = Settings.SCORE_WEIGHTS["motor"]
+COGNITIVE_WEIGHT = Settings.SCORE_WEIGHTS["cognitive"]
+
+def build_cohort(n_patients: int, n_protocols: int, n_history: int, history_weeks: int,
+                 history_protocols: int = 10, seed: int = 0):
+    """Synthetic patients and protocols; the first n_history patients also get sessions"""
+    random.seed(seed)
+    protocols = [generate_random_protocol(f"PR{i:05d}") for i in range(n_protocols)]
+    patients = [generate_random_patient(f"P{i:06d}") for i in range(n_patients)]
+    protocol_ids = [p.protocol_id for p in protocols]
+    for patient in patients[:n_history]:
+        patient.prescriptions, patient.sessions = generate_random_history(
+            patient.patient_id, random.sample(protocol_ids, min(history_protocols, len(protocol_ids))), history_weeks
+        )
+    return patients, protocols
+
+def measure(call: Callable[[object], object], inputs: List[object], items_per_call: int = 1,
+            repeat: int = 1) -> Dict[str, float]:
+    """Latency percentiles and throughput of call over inputs, then peak memory of one pass"""
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            call(item)
+            latencies.append(time.perf_counter() - start)
+
+    # Measured separately: tracemalloc slows allocations down noticeably
+    tracemalloc.start()
+    for item in inputs:
+        call(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    return {
+        "calls": len(latencies),
+        "throughput": len(latencies) * items_per_call / latencies.sum() if latencies.sum() else float("inf"),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "peak_memory_kb": peak / 1024,
+    }
+
+def run_benchmarks(patients: List[Patient], protocols, sample: int, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """Time every case; per-patient cases use the first `sample` patients"""
+    index = ProtocolFeatureIndex(protocols)
+    sampled = patients[:sample]
+    with_history = [p for p in sampled if p.sessions]
+    scored = [ProtocolScorer(p, index).score_all_protocols(MOTOR_WEIGHT, COGNITIVE_WEIGHT) for p in sampled]
+    cohort_scorer = CohortScorer(index)
+    registry = ProtocolRegistry(protocols={p.protocol_id: p for p in protocols})
+
+    cases = {
+        "filter_protocols": measure(lambda p: filter_protocols(protocols, p), sampled),
+        "filter_protocols_indexed": measure(lambda p: filter_protocols(index, p), sampled, repeat=repeat),
+        "score_all_protocols": measure(
+            lambda p: ProtocolScorer(p, index).score_all_protocols(MOTOR_WEIGHT, COGNITIVE_WEIGHT),
+            sampled, repeat=repeat),
+        "top_k_10": measure(
+            lambda p: ProtocolScorer(p, index).top_k(10, MOTOR_WEIGHT, COGNITIVE_WEIGHT),
+            sampled, repeat=repeat),
+        "cohort_score_matrix": measure(
+            lambda cohort: cohort_scorer.score_matrix(cohort, MOTOR_WEIGHT, COGNITIVE_WEIGHT),
+            [patients], items_per_call=len(patients), repeat=repeat),
+        "generate_weekly_plan": measure(generate_weekly_plan, scored, repeat=repeat),
+    }
+    if with_history:
+        cases["weekly_aggregator"] = measure(lambda p: p.weekly_aggregator, with_history, repeat=repeat)
+        cases["protocol_aggregator"] = measure(lambda p: p.protocol_aggregator.protocol_scores, with_history, repeat=repeat)
+        cases["registry_update"] = measure(
+            lambda cohort: registry.update_aggregators(cohort), [with_history],
+            items_per_call=len(with_history), repeat=repeat)
+    return cases
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """Human-readable regressions of results against baseline (empty when none)"""
+    regressions = []
+    for case, metrics in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            continue
+        for metric in ("p50_ms", "p99_ms", "peak_memory_kb"):
+            if reference[metric] and metrics[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{case}.{metric}: {reference[metric]:.3f} -> {metrics[metric]:.3f}")
+        if metrics["throughput"] < reference["throughput"] * (1 - tolerance):
+            regressions.append(f"{case}.throughput: {reference['throughput']:.1f} -> {metrics['throughput']:.1f}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark scoring, planning and aggregation")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--protocols", type=int, default=200)
+    parser.add_argument("--sample", type=int, default=200, help="Patients timed in per-patient cases")
+    parser.add_argument("--history-weeks", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write results as JSON (e.g. a new baseline)")
+    parser.add_argument("--baseline", type=Path, help="Compare against a saved JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    sample = min(args.sample, args.patients)
+    patients, protocols = build_cohort(args.patients, args.protocols, sample, args.history_weeks, seed=args.seed)
+    results = run_benchmarks(patients, protocols, sample, repeat=args.repeat)
+
+    report = {
+        "meta": {
+            "patients": args.patients,
+            "protocols": args.protocols,
+            "sample": sample,
+            "history_weeks": args.history_weeks,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        },
+        "cases": results,
+    }
+    for case, metrics in results.items():
+        print(f"{case:28s} {metrics['throughput']:>12.1f}/s  p50 {metrics['p50_ms']:>9.3f} ms  "
+              f"p99 {metrics['p99_ms']:>9.3f} ms  peak {metrics['peak_memory_kb']:>10.1f} KiB")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["meta"]["patients"] != args.patients or baseline["meta"]["protocols"] != args.protocols:
+            print("warning: baseline was recorded with a different cohort size", file=sys.stderr)
+        regressions = compare(results, baseline["cases"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
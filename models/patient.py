@@ -1,16 +1,61 @@
 from typing import Dict, Any
 from datetime import datetime, date, timedelta
-from pydantic import BaseModel, Field, field_validator, computed_field
-from typing import List, Dict, Optional, Any
-import pandas as pd
+from pydantic import BaseModel, Field, PrivateAttr, field_serializer, field_validator, computed_field
+from typing import Callable, ClassVar, List, Dict, Optional, Any, Tuple, Union
 import numpy as np
 from models.session import Prescription, Session
+from models.session_frame import SessionFrame, as_session_frame, week_start_days
 from models.protocol import Protocol
 
 #########################
 ###### AGGREGATORS ######
 #########################
 
+# A session history: pydantic models, or the same sessions as columns
+SessionHistory = Union[List[Session], SessionFrame]
+
+class _HistorySignature:
+    """
+    Cheap change marker for a history list: identity, length and last item.
+
+    The list and its last item are held, not their ids, so a freed list can never
+    be mistaken for a new one that reuses its address.
+    """
+    __slots__ = ("items", "length", "last")
+
+    def __init__(self, items: SessionHistory):
+        self.items = items
+        self.length = len(items)
+        # Frames are immutable: identity and length are enough
+        self.last = items[-1] if len(items) and not isinstance(items, SessionFrame) else None
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, _HistorySignature) and self.items is other.items
+                and self.length == other.length and self.last is other.last)
+
+    def appended(self, items: SessionHistory) -> Optional[List[Session]]:
+        """Items appended to the same list since the signature was taken; None if it changed otherwise"""
+        if items is not self.items or isinstance(items, SessionFrame) or len(items) < self.length:
+            return None
+        if self.length and items[self.length - 1] is not self.last:
+            return None
+        return items[self.length:]
+
+def _frames_to_dicts(value: Any) -> Any:
+    # Frames nested in free-form aggregator dicts serialize as their column lists
+    if isinstance(value, SessionFrame):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: _frames_to_dicts(item) for key, item in value.items()}
+    return value
+
+def _extend_history(history: SessionHistory, sessions: SessionHistory) -> SessionHistory:
+    """history + sessions; lists are extended in place, frames are concatenated"""
+    if isinstance(history, SessionFrame) or isinstance(sessions, SessionFrame):
+        return SessionFrame.concat([as_session_frame(history), as_session_frame(sessions)])
+    history.extend(sessions)
+    return history
+
 class WeeklyPrescription(BaseModel):
     """Aggregates prescription data by week"""
     patient_id: str
@@ -27,40 +72,167 @@ class WeeklyPrescription(BaseModel):
     #         for week, (prescriptions, sessions) in self.weekly_data.items()
     #     }
 
-    def add_data(self, prescription: Prescription, sessions: List[Session]):
-        """Group prescriptions and sessions by week"""
+    @field_serializer('weekly_data')
+    def _serialize_weekly_data(self, weekly_data: Dict[date, Dict[str, Any]]) -> Dict[date, Dict[str, Any]]:
+        return _frames_to_dicts(weekly_data)
+
+    # Week buckets of the last sessions list seen, reused while that list is unchanged
+    _session_index: Optional[Tuple[_HistorySignature, "SessionWeekIndex"]] = PrivateAttr(default=None)
+
+    def add_data(self, prescription: Prescription, sessions: SessionHistory):
+        """
+        Group prescriptions and sessions by week (a week's sessions have the input's type).
+
+        Each tracked week lists each session once: a week takes its bucket when first
+        tracked, and weeks tracked earlier only receive sessions not handed out yet.
+        """
+        new_weeks = []
         current_date = prescription.start_date
         while current_date <= prescription.end_date:
             week_start = current_date - timedelta(days=current_date.weekday())
-            self.weekly_data.setdefault(week_start, {
-                'prescriptions': [],
-                'sessions': []
-            })
+            if week_start not in self.weekly_data:
+                self.weekly_data[week_start] = {
+                    'prescriptions': [],
+                    'sessions': []
+                }
+                new_weeks.append(week_start)
             self.weekly_data[week_start]['prescriptions'].append(prescription)
             current_date += timedelta(weeks=1)
 
-        for session in sessions:
-            week_start = session.timestamp.date() - timedelta(
-                days=session.timestamp.date().weekday()
-            )
-            if week_start in self.weekly_data:
-                self.weekly_data[week_start]['sessions'].append(session)
+        index, unseen = self._week_index(sessions)
+        for week_start in new_weeks:
+            if week_start in index.buckets:
+                data = self.weekly_data[week_start]
+                data['sessions'] = _extend_history(data['sessions'], index.buckets[week_start])
+        if unseen is not None:
+            new_week_set = set(new_weeks)
+            for week_start, bucket in unseen.buckets.items():
+                if week_start in self.weekly_data and week_start not in new_week_set:
+                    data = self.weekly_data[week_start]
+                    data['sessions'] = _extend_history(data['sessions'], bucket)
+
+    def _week_index(self, sessions: SessionHistory) -> Tuple["SessionWeekIndex", Optional["SessionWeekIndex"]]:
+        """Buckets of `sessions`, and buckets of the sessions earlier weeks have not received (None: none)"""
+        signature = _HistorySignature(sessions)
+        if self._session_index is not None and self._session_index[0] == signature:
+            return self._session_index[1], None
+        appended = self._session_index[0].appended(sessions) if self._session_index is not None else None
+        index = SessionWeekIndex(sessions)
+        self._session_index = (signature, index)
+        # Same list grown by appending: only the tail is new; any other history is new as a whole
+        return index, (SessionWeekIndex(appended) if appended is not None else index)
+
+class SessionWeekIndex:
+    """Sessions bucketed by the Monday of their week, computed once per sessions list"""
+    def __init__(self, sessions: SessionHistory):
+        self.buckets: Dict[date, SessionHistory] = {}
+        if not len(sessions):
+            return
+        if isinstance(sessions, SessionFrame):
+            week_starts = sessions.week_starts()
+        else:
+            week_starts = week_start_days(np.array([s.timestamp for s in sessions], dtype="datetime64[D]"))
+        order = np.argsort(week_starts, kind="stable")  # keeps session order within a week
+        starts, first = np.unique(week_starts[order], return_index=True)
+        for week, group in zip(starts.astype(object), np.split(order, first[1:])):
+            if isinstance(sessions, SessionFrame):
+                self.buckets[week] = sessions.take(group)
+            else:
+                self.buckets[week] = [sessions[i] for i in group]
+
+    def weeks(self) -> List[date]:
+        return sorted(self.buckets)
+
+EWMA_ALPHA = 0.3
+
+class EWMAState(BaseModel):
+    """
+    Running EWMA of one patient-protocol pair, updated in O(1) per session.
+
+    Reproduces pandas `Series.ewm(alpha=alpha).mean()` (adjust=True) over sessions
+    in timestamp order, including its float rounding, so values match the former
+    DataFrame computation exactly. Plain fields: persist with model_dump() and
+    resume with EWMAState(**data).
+    """
+    alpha: float = EWMA_ALPHA
+    count: int = 0
+    weight: float = Field(default=0.0, description="pandas' old_wt: decayed sum of past weights")
+    adherence: Optional[float] = None
+    performance: Optional[float] = None
+    difficulty_change: Optional[float] = None
+    last_difficulty: Optional[float] = None
+    last_timestamp: Optional[datetime] = None
+
+    def update(self, session: Session):
+        """Fold in the next session (timestamps are expected in non-decreasing order)"""
+        self._fold([session.adherence], [session.performance_score], [session.difficulty_modulator])
+        self.last_timestamp = session.timestamp
+
+    def update_frame(self, frame: SessionFrame):
+        """Fold in a frame of next sessions, already in timestamp order"""
+        if len(frame):
+            self._fold(frame.adherence.tolist(), frame.performance_score.tolist(), frame.difficulty_modulator.tolist())
+            self.last_timestamp = frame.timestamp[-1].item()
+
+    def _fold(self, adherence: List[float], performance: List[float], difficulty: List[float]):
+        # Same steps as pandas' ewm kernel; alpha goes through com like pandas does
+        decay = 1.0 - 1.0 / (1.0 + (1.0 / self.alpha - 1.0))
+        for adherence_value, performance_value, modulator in zip(adherence, performance, difficulty):
+            change = 0.0 if self.last_difficulty is None else modulator - self.last_difficulty
+            values = (adherence_value, performance_value, change)
+            if self.count == 0:
+                self.adherence, self.performance, self.difficulty_change = values
+                self.weight = 1.0
+            else:
+                self.weight *= decay
+                self.adherence, self.performance, self.difficulty_change = (
+                    current if current == value else (self.weight * current + value) / (self.weight + 1.0)
+                    for current, value in zip((self.adherence, self.performance, self.difficulty_change), values)
+                )
+                self.weight += 1.0
+            self.count += 1
+            self.last_difficulty = modulator
+
+    def metrics(self) -> Optional[Dict[str, float]]:
+        if self.count == 0:
+            return None
+        return {
+            "ewma_adherence": self.adherence,
+            "ewma_performance": self.performance,
+            "ewma_difficulty_modulator_change": self.difficulty_change,
+        }
+
+    @classmethod
+    def from_sessions(cls, sessions: SessionHistory, alpha: float = EWMA_ALPHA) -> "EWMAState":
+        state = cls(alpha=alpha)
+        if isinstance(sessions, SessionFrame):
+            state.update_frame(sessions.take(sessions.time_order()))
+        else:
+            for session in sorted(sessions, key=lambda s: s.timestamp):
+                state.update(session)
+        return state
 
 class ProtocolSessions(BaseModel):
     """Aggregates protocol performance for a single patient"""
     patient_id: str
     protocol_stats: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    # Running EWMA (alpha=EWMA_ALPHA) per protocol; may be restored from a persisted dump
+    ewma_states: Dict[str, EWMAState] = Field(default_factory=dict)
+
+    @field_serializer('protocol_stats')
+    def _serialize_protocol_stats(self, protocol_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return _frames_to_dicts(protocol_stats)
 
     @computed_field
     def protocol_scores(self) -> Dict[str, float]:
         """Average performance scores per protocol"""
         return {
-            proto_id: self.get_ewma_metrics(proto_id)
-            for proto_id, stats in self.protocol_stats.items()
-            if stats['sessions']
+            proto_id: state.metrics()
+            for proto_id, state in self.ewma_states.items()
+            if state.count
         }
 
-    def get_ewma_metrics(self, protocol_id: str, alpha: float = 0.3) -> Optional[Dict[str, float]]:
+    def get_ewma_metrics(self, protocol_id: str, alpha: float = EWMA_ALPHA) -> Optional[Dict[str, float]]:
         """
         Compute Exponential Weighted Moving Average (EWMA) for adherence, performance, and difficulty modulator change.
 
@@ -71,78 +243,121 @@ class ProtocolSessions(BaseModel):
         Returns:
             Dict[str, float]: EWMA values for adherence, performance, and difficulty modulator change.
         """
-        if protocol_id not in self.protocol_stats or not self.protocol_stats[protocol_id]['sessions']:
-            return None  # No data for this protocol
-
-        # Extract sessions for the given protocol
-        sessions = sorted(self.protocol_stats[protocol_id]['sessions'], key=lambda s: s.timestamp)
-
-        # Create a DataFrame for EWMA calculation
-        df = pd.DataFrame({
-            "timestamp": [s.timestamp for s in sessions],
-            "adherence": [s.adherence for s in sessions],
-            "performance_score": [s.performance_score for s in sessions],
-            "difficulty_modulator": [s.difficulty_modulator for s in sessions]
-        })
-
-        # Compute EWMA
-        df["ewma_adherence"] = df["adherence"].ewm(alpha=alpha).mean()
-        df["ewma_performance"] = df["performance_score"].ewm(alpha=alpha).mean()
+        if alpha == EWMA_ALPHA and protocol_id in self.ewma_states:
+            return self.ewma_states[protocol_id].metrics()
 
-        # Compute difficulty modulator change
-        df["difficulty_modulator_change"] = df["difficulty_modulator"].diff().fillna(0)
-        df["ewma_difficulty_change"] = df["difficulty_modulator_change"].ewm(alpha=alpha).mean()
-
-        # Return the latest EWMA values
-        latest_values = df.iloc[-1][["ewma_adherence", "ewma_performance", "ewma_difficulty_change"]].to_dict()
-
-        return {
-            "ewma_adherence": latest_values["ewma_adherence"],
-            "ewma_performance": latest_values["ewma_performance"],
-            "ewma_difficulty_modulator_change": latest_values["ewma_difficulty_change"]
-        }
+        if protocol_id not in self.protocol_stats or not len(self.protocol_stats[protocol_id]['sessions']):
+            return None  # No data for this protocol
+        return EWMAState.from_sessions(self.protocol_stats[protocol_id]['sessions'], alpha).metrics()
 
-    def add_sessions(self, sessions: List[Session]):
+    def add_sessions(self, sessions: SessionHistory):
         """Update statistics with new sessions"""
+        if isinstance(sessions, SessionFrame):
+            self._add_frame(sessions)
+            return
         for session in sessions:
             proto_stats = self.protocol_stats.setdefault(session.protocol_id, {
                 'sessions': [],
             })
             proto_stats['sessions'].append(session)
 
+            state = self.ewma_states.setdefault(session.protocol_id, EWMAState())
+            if state.last_timestamp is None or session.timestamp >= state.last_timestamp:
+                state.update(session)
+            elif state.count == len(proto_stats['sessions']) - 1:
+                # Out of order, but every session is held here: refold in timestamp order
+                self.ewma_states[session.protocol_id] = EWMAState.from_sessions(proto_stats['sessions'])
+            else:
+                # Resumed state without its earlier sessions: cannot reorder, fold in arrival order
+                state.update(session)
+
+    def _add_frame(self, frame: SessionFrame):
+        # Same rules as the per-session path, applied to each protocol's block of rows
+        for (protocol_id,), rows in frame.group_rows("protocol_id").items():
+            part = frame.take(rows)
+            part = part.take(part.time_order())
+            proto_stats = self.protocol_stats.setdefault(protocol_id, {'sessions': []})
+            held = len(proto_stats['sessions'])
+            proto_stats['sessions'] = _extend_history(proto_stats['sessions'], part)
+
+            state = self.ewma_states.setdefault(protocol_id, EWMAState())
+            if state.last_timestamp is not None and part.timestamp[0] < np.datetime64(state.last_timestamp) \
+                    and state.count == held:
+                self.ewma_states[protocol_id] = EWMAState.from_sessions(proto_stats['sessions'])
+            else:
+                state.update_frame(part)
+
 class PatientSessions(BaseModel):
     """Aggregates patient data across protocols"""
     protocol_id: str
     patient_stats: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
 
+    @field_serializer('patient_stats')
+    def _serialize_patient_stats(self, patient_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return _frames_to_dicts(patient_stats)
+
     @computed_field
     def average_performance(self) -> float:
         """Cross-patient average for this protocol"""
-        total = sum(
-            sum(s.performance_score for s in stats['sessions'])
-            for stats in self.patient_stats.values()
-        )
-        count = sum(len(stats['sessions']) for stats in self.patient_stats.values())
+        total = sum(_stats_total(stats, 'total_performance', 'performance_score') for stats in self.patient_stats.values())
+        count = sum(stats['num_sessions'] for stats in self.patient_stats.values())
         return total / count if count else 0.0
 
     @computed_field
     def average_adherence(self) -> float:
         """Cross-patient average for this protocol"""
-        total = sum(
-            sum(s.adherence for s in stats['sessions'])
-            for stats in self.patient_stats.values()
-        )
-        count = sum(len(stats['sessions']) for stats in self.patient_stats.values())
+        total = sum(_stats_total(stats, 'total_adherence', 'adherence') for stats in self.patient_stats.values())
+        count = sum(stats['num_sessions'] for stats in self.patient_stats.values())
         return total / count if count else 0.0
 
-    def add_patient_sessions(self, patient_id: str, sessions: List[Session]):
+    def add_patient_sessions(self, patient_id: str, sessions: SessionHistory):
         """Add patient's sessions to the aggregator"""
-        relevant = [s for s in sessions if s.protocol_id == self.protocol_id]
+        if isinstance(sessions, SessionFrame):
+            relevant = sessions.take(sessions.codes["protocol_id"] == sessions.code_of("protocol_id", self.protocol_id))
+        else:
+            relevant = [s for s in sessions if s.protocol_id == self.protocol_id]
+        self.set_patient_sessions(patient_id, relevant)
+
+    def set_patient_sessions(self, patient_id: str, sessions: SessionHistory):
+        """Replace a patient's stats with these sessions (already filtered to this protocol)"""
         self.patient_stats[patient_id] = {
-            'num_sessions': len(relevant),
-            'total_duration': sum(s.duration for s in relevant),
-            'sessions': relevant
+            'num_sessions': 0,
+            'total_duration': 0,
+            'total_performance': 0.0,
+            'total_adherence': 0.0,
+            'sessions': SessionFrame.empty() if isinstance(sessions, SessionFrame) else [],
         }
+        self.extend_patient_sessions(patient_id, sessions)
+
+    def extend_patient_sessions(self, patient_id: str, sessions: SessionHistory):
+        """Fold new sessions (already filtered to this protocol) into a patient's running totals"""
+        stats = self.patient_stats.get(patient_id)
+        if stats is None or 'total_performance' not in stats:
+            history = (stats or {}).get('sessions', [])
+            if isinstance(history, list):
+                history = list(history)  # not the caller's list
+            self.set_patient_sessions(patient_id, _extend_history(history, sessions))
+            return
+        if isinstance(sessions, SessionFrame):
+            totals = sessions.totals()  # vectorized sums
+        else:
+            totals = {
+                'num_sessions': len(sessions),
+                'total_duration': sum(s.duration for s in sessions),
+                'total_performance': sum(s.performance_score for s in sessions),
+                'total_adherence': sum(s.adherence for s in sessions),
+            }
+        for key, value in totals.items():
+            stats[key] += value
+        stats['sessions'] = _extend_history(stats['sessions'], sessions)
+
+def _stats_total(stats: Dict[str, Any], key: str, attribute: str) -> float:
+    # Entries built before running totals existed only hold the sessions
+    if key in stats:
+        return stats[key]
+    if isinstance(stats['sessions'], SessionFrame):
+        return float(getattr(stats['sessions'], attribute).sum())
+    return sum(getattr(s, attribute) for s in stats['sessions'])
 
 #########################
 ##### PATIENT MODEL #####
@@ -252,18 +467,62 @@ class Patient(BaseModel):
     prescriptions: List[Prescription] = Field(default_factory=list)
     sessions: List[Session] = Field(default_factory=list)
 
+    AGGREGATOR_FIELDS: ClassVar[frozenset] = frozenset({"weekly_aggregator", "protocol_aggregator"})
+
+    # name -> (history signature it was built from, aggregator)
+    _aggregators: Dict[str, Tuple[Tuple[_HistorySignature, ...], Any]] = PrivateAttr(default_factory=dict)
+
     @computed_field
     def weekly_aggregator(self) -> WeeklyPrescription:
-        aggregator = WeeklyPrescription(patient_id=self.patient_id)
-        for prescription in self.prescriptions:  # Ensure handling multiple prescriptions
-            aggregator.add_data(prescription, self.sessions)
-        return aggregator
+        def build() -> WeeklyPrescription:
+            aggregator = WeeklyPrescription(patient_id=self.patient_id)
+            for prescription in self.prescriptions:  # Ensure handling multiple prescriptions
+                aggregator.add_data(prescription, self.sessions)
+            return aggregator
+        return self._memoized("weekly_aggregator", (self.prescriptions, self.sessions), build)
 
     @computed_field
     def protocol_aggregator(self) -> ProtocolSessions:
-        aggregator = ProtocolSessions(patient_id=self.patient_id)
-        aggregator.add_sessions(self.sessions)
-        return aggregator
+        def build() -> ProtocolSessions:
+            aggregator = ProtocolSessions(patient_id=self.patient_id)
+            aggregator.add_sessions(self.sessions)
+            return aggregator
+        return self._memoized("protocol_aggregator", (self.sessions,), build)
+
+    @property
+    def session_frame(self) -> SessionFrame:
+        """The sessions as a SessionFrame, rebuilt only when `sessions` changes"""
+        return self._memoized("session_frame", (self.sessions,), lambda: SessionFrame.from_sessions(self.sessions))
+
+    def invalidate_aggregators(self):
+        """Force a rebuild after editing history in place (e.g. replacing a list item)"""
+        self._aggregators.clear()
+
+    def model_dump(self, *, aggregators: bool = True, **kwargs) -> Dict[str, Any]:
+        """model_dump; aggregators=False leaves the computed aggregators out without building them"""
+        if not aggregators:
+            kwargs["exclude"] = _exclude_fields(kwargs.get("exclude"), self.AGGREGATOR_FIELDS)
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, *, aggregators: bool = True, **kwargs) -> str:
+        if not aggregators:
+            kwargs["exclude"] = _exclude_fields(kwargs.get("exclude"), self.AGGREGATOR_FIELDS)
+        return super().model_dump_json(**kwargs)
+
+    def _memoized(self, name: str, sources: Tuple[list, ...], build: Callable[[], Any]) -> Any:
+        # Reassigning, appending to or removing from prescriptions/sessions changes the signature
+        signature = tuple(_HistorySignature(items) for items in sources)
+        cached = self._aggregators.get(name)
+        if cached is None or cached[0] != signature:
+            cached = self._aggregators[name] = (signature, build())
+        return cached[1]
+
+def _exclude_fields(exclude, fields) -> Any:
+    if exclude is None:
+        return set(fields)
+    if isinstance(exclude, dict):
+        return {**exclude, **{field: True for field in fields}}
+    return set(exclude) | set(fields)
 
 #########################
 ###### GLOBAL DATA ######
@@ -274,13 +533,60 @@ class ProtocolRegistry(BaseModel):
     protocols: Dict[str, Protocol] = Field(default_factory=dict)
     patient_aggregators: Dict[str, PatientSessions] = Field(default_factory=dict)
 
-    def update_aggregators(self, patients: List[Patient]):
-        """Refresh all cross-patient statistics"""
+    # patient_id -> protocols holding stats for them / session ids already folded in / sessions list folded
+    _protocols_by_patient: Dict[str, set] = PrivateAttr(default_factory=dict)
+    _seen_sessions: Dict[str, set] = PrivateAttr(default_factory=dict)
+    _folded: Dict[str, _HistorySignature] = PrivateAttr(default_factory=dict)
+
+    def update_aggregators(self, patients: List[Patient], incremental: bool = False):
+        """
+        Refresh all cross-patient statistics in one pass over the sessions.
+
+        Each patient's SessionFrame is grouped by protocol once, then each group
+        replaces that patient's stats for the protocol (totals are vectorized sums). With incremental=True,
+        only sessions not seen by an earlier update are folded into the running totals. When a
+        patient's sessions list only grew by appending since, just the appended sessions are
+        converted and summed; the stored per-protocol frames are still concatenated (an array copy).
+        Any other change to the list falls back to filtering the whole history by session id.
+        """
         for protocol in self.protocols.values():
-            agg = self.patient_aggregators.setdefault(
-                protocol.protocol_id,
-                PatientSessions(protocol_id=protocol.protocol_id)
-            )
-            for patient in patients:
-                if patient.sessions:
-                    agg.add_patient_sessions(patient.patient_id, patient.sessions)
+            self.patient_aggregators.setdefault(protocol.protocol_id, PatientSessions(protocol_id=protocol.protocol_id))
+
+        grouped: Dict[str, Dict[str, SessionFrame]] = {}
+        for patient in patients:
+            if not incremental:
+                # A full refresh replaces everything previously held for this patient, even with no sessions left
+                for protocol_id in self._protocols_by_patient.pop(patient.patient_id, ()):
+                    self.patient_aggregators[protocol_id].patient_stats.pop(patient.patient_id, None)
+                self._seen_sessions.pop(patient.patient_id, None)
+            frame = self._unfolded_sessions(patient)
+            for (protocol_id,), rows in frame.group_rows("protocol_id").items():
+                grouped.setdefault(protocol_id, {})[patient.patient_id] = frame.take(rows)
+
+        for protocol_id, by_patient in grouped.items():
+            aggregator = self.patient_aggregators.get(protocol_id)
+            if aggregator is None:
+                continue  # Not a registered protocol
+            for patient_id, sessions in by_patient.items():
+                if incremental:
+                    aggregator.extend_patient_sessions(patient_id, sessions)
+                else:
+                    aggregator.set_patient_sessions(patient_id, sessions)
+                self._protocols_by_patient.setdefault(patient_id, set()).add(protocol_id)
+
+    def _unfolded_sessions(self, patient: Patient) -> SessionFrame:
+        """The patient's sessions not folded into the stats yet (all of them after a full reset)"""
+        seen = self._seen_sessions.setdefault(patient.patient_id, set())
+        folded = self._folded.get(patient.patient_id)
+        appended = folded.appended(patient.sessions) if seen and folded is not None else None
+        if appended is not None:
+            # Same list, only appended to: O(new sessions)
+            frame = SessionFrame.from_sessions([s for s in appended if s.session_id not in seen])
+        else:
+            frame = patient.session_frame
+            if seen:
+                frame = frame.take(np.fromiter((sid not in seen for sid in frame.session_ids()),
+                                               dtype=bool, count=len(frame)))
+        seen.update(frame.session_ids())
+        self._folded[patient.patient_id] = _HistorySignature(patient.sessions)
+        return frame
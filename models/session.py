@@ -25,9 +25,10 @@ class Session(BaseModel):
     @computed_field
     def adherence(self) -> float:
         """Session-specific duration adherence"""
-        if self.prescribed_duration == 0:
+        prescribed_duration = self.prescribed_duration
+        if prescribed_duration == 0:
             return 0.0
-        return min(self.duration / self.prescribed_duration, 1.0)
+        return min(self.duration / prescribed_duration, 1.0)
 
 class Prescription(BaseModel):
     """Protocol planned for a weekly schedule"""
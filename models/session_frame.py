@@ -0,0 +1,249 @@
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from pydantic_core import core_schema
+
+from models.session import Prescription, Session
+
+FLOAT_COLUMNS = ("duration", "difficulty_modulator", "performance_score")
+CATEGORY_COLUMNS = ("patient_id", "protocol_id", "prescription_id")
+
+class SessionFrame:
+    """
+    Columnar, immutable batch of sessions.
+
+    NumPy arrays hold timestamps and metrics; session ids are UTF-8 encoded into
+    a fixed-width bytes column, and patient, protocol and prescription ids are
+    categorical (the narrowest unsigned codes into a tuple of categories). The
+    prescribed duration is taken once from the prescription backref when the
+    frame is built; adherence is derived from it on access.
+    Every column is read-only; derive new frames with take() or concat().
+    Aggregators accept a frame wherever they accept a list of Session objects.
+    """
+    __slots__ = ("session_id", "timestamp", "codes", "categories", "prescribed_duration") + FLOAT_COLUMNS
+
+    def __init__(self, session_id: np.ndarray, timestamp: np.ndarray, codes: Dict[str, np.ndarray],
+                 categories: Dict[str, Tuple[str, ...]], prescribed_duration: np.ndarray, **columns: np.ndarray):
+        object.__setattr__(self, "session_id", _readonly(session_id))
+        object.__setattr__(self, "timestamp", _readonly(timestamp))
+        object.__setattr__(self, "codes", {name: _readonly(_narrow(array, len(categories[name])))
+                                           for name, array in codes.items()})
+        object.__setattr__(self, "categories", categories)
+        object.__setattr__(self, "prescribed_duration", _readonly(prescribed_duration))
+        for name in FLOAT_COLUMNS:
+            object.__setattr__(self, name, _readonly(columns[name]))
+
+    @classmethod
+    def from_sessions(cls, sessions: Sequence[Session]) -> "SessionFrame":
+        n = len(sessions)
+        codes, categories = {}, {}
+        for name in CATEGORY_COLUMNS:
+            lookup: Dict[str, int] = {}
+            codes[name] = np.fromiter((lookup.setdefault(getattr(s, name), len(lookup)) for s in sessions),
+                                      dtype=np.int32, count=n)
+            categories[name] = tuple(lookup)
+
+        return cls(
+            session_id=_encode_ids([s.session_id for s in sessions]),
+            timestamp=np.array([s.timestamp for s in sessions], dtype="datetime64[us]").reshape(n),
+            codes=codes,
+            categories=categories,
+            # Prescription.prescribed_duration is an int (0 for unlinked sessions), so int32 is exact
+            prescribed_duration=np.fromiter((s.prescribed_duration for s in sessions), dtype=np.int32, count=n),
+            duration=np.fromiter((s.duration for s in sessions), dtype=np.float64, count=n),
+            difficulty_modulator=np.fromiter((s.difficulty_modulator for s in sessions), dtype=np.float64, count=n),
+            performance_score=np.fromiter((s.performance_score for s in sessions), dtype=np.float64, count=n),
+        )
+
+    @classmethod
+    def empty(cls) -> "SessionFrame":
+        return cls.from_sessions([])
+
+    @classmethod
+    def concat(cls, frames: Sequence["SessionFrame"]) -> "SessionFrame":
+        """Rows of every frame in order; categories are merged and codes remapped"""
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return cls.empty()
+        if len(frames) == 1:
+            return frames[0]
+        codes, categories = {}, {}
+        for name in CATEGORY_COLUMNS:
+            lookup: Dict[str, int] = {}
+            remapped = []
+            for frame in frames:
+                mapping = np.array([lookup.setdefault(c, len(lookup)) for c in frame.categories[name]], dtype=np.int32)
+                remapped.append(mapping[frame.codes[name]])
+            codes[name] = np.concatenate(remapped)
+            categories[name] = tuple(lookup)
+        return cls(
+            session_id=np.concatenate([frame.session_id for frame in frames]),
+            timestamp=np.concatenate([frame.timestamp for frame in frames]),
+            codes=codes,
+            categories=categories,
+            prescribed_duration=np.concatenate([frame.prescribed_duration for frame in frames]),
+            **{name: np.concatenate([getattr(frame, name) for frame in frames]) for name in FLOAT_COLUMNS},
+        )
+
+    def __len__(self) -> int:
+        return len(self.session_id)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SessionFrame is immutable")
+
+    @property
+    def adherence(self) -> np.ndarray:
+        """Session.adherence per row: 0 without a prescribed duration, capped at 1"""
+        adherence = np.zeros(len(self), dtype=np.float64)
+        linked = self.prescribed_duration != 0
+        adherence[linked] = np.minimum(self.duration[linked] / self.prescribed_duration[linked], 1.0)
+        return _readonly(adherence)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns, including the category strings"""
+        arrays = [self.session_id, self.timestamp, self.prescribed_duration, *self.codes.values(),
+                  *(getattr(self, n) for n in FLOAT_COLUMNS)]
+        strings = [c for categories in self.categories.values() for c in categories]
+        return sum(a.nbytes for a in arrays) + sum(sys.getsizeof(s) for s in strings)
+
+    def session_ids(self) -> List[str]:
+        """Decoded session ids, in row order"""
+        return [sid.decode() for sid in self.session_id.tolist()]
+
+    def take(self, rows: Union[np.ndarray, slice]) -> "SessionFrame":
+        """Subset by index array, boolean mask or slice (categories are kept as they are)"""
+        return SessionFrame(
+            session_id=self.session_id[rows],
+            timestamp=self.timestamp[rows],
+            codes={name: codes[rows] for name, codes in self.codes.items()},
+            categories=self.categories,
+            prescribed_duration=self.prescribed_duration[rows],
+            **{name: getattr(self, name)[rows] for name in FLOAT_COLUMNS},
+        )
+
+    def ids(self, name: str) -> np.ndarray:
+        """Decoded values of one categorical column"""
+        return np.array(self.categories[name], dtype=object)[self.codes[name]] if len(self) else np.array([], dtype=object)
+
+    def code_of(self, name: str, value: str) -> Optional[int]:
+        try:
+            return self.categories[name].index(value)
+        except ValueError:
+            return None
+
+    def time_order(self) -> np.ndarray:
+        """Row order by timestamp; ties keep their current order"""
+        return np.argsort(self.timestamp, kind="stable")
+
+    def week_starts(self) -> np.ndarray:
+        """Monday (datetime64[D]) of each session's week"""
+        return week_start_days(self.timestamp)
+
+    def group_rows(self, *names: str) -> Dict[Tuple[str, ...], np.ndarray]:
+        """Row indices (in frame order) per combination of categorical values"""
+        if not len(self):
+            return {}
+        key = np.zeros(len(self), dtype=np.int64)
+        for name in names:
+            key = key * len(self.categories[name]) + self.codes[name]
+        order = np.argsort(key, kind="stable")
+        unique, first = np.unique(key[order], return_index=True)
+        groups = {}
+        for value, rows in zip(unique.tolist(), np.split(order, first[1:])):
+            labels = []
+            for name in reversed(names):
+                value, code = divmod(value, len(self.categories[name]))
+                labels.append(self.categories[name][code])
+            groups[tuple(reversed(labels))] = rows
+        return groups
+
+    def totals(self) -> Dict[str, float]:
+        """Running-total fields used by the cross-patient aggregator"""
+        return {
+            'num_sessions': len(self),
+            'total_duration': float(self.duration.sum()),
+            'total_performance': float(self.performance_score.sum()),
+            'total_adherence': float(self.adherence.sum()),
+        }
+
+    def to_sessions(self, prescriptions: Optional[Dict[str, Prescription]] = None) -> List[Session]:
+        """
+        Rebuild Session models; pass prescriptions by id to restore the `_prescription` backref.
+
+        Without it, adherence of the rebuilt sessions is 0 as for any unlinked Session.
+        """
+        columns = {name: self.ids(name) for name in CATEGORY_COLUMNS}
+        session_ids = self.session_ids()
+        sessions = []
+        for i in range(len(self)):
+            session = Session(
+                session_id=session_ids[i],
+                patient_id=columns["patient_id"][i],
+                protocol_id=columns["protocol_id"][i],
+                prescription_id=columns["prescription_id"][i],
+                timestamp=self.timestamp[i].item(),
+                duration=float(self.duration[i]),
+                difficulty_modulator=float(self.difficulty_modulator[i]),
+                performance_score=float(self.performance_score[i]),
+            )
+            if prescriptions:
+                session._prescription = prescriptions.get(session.prescription_id)
+            sessions.append(session)
+        return sessions
+
+    def to_dict(self) -> Dict[str, list]:
+        """Plain column lists (JSON-friendly, timestamps as datetimes)"""
+        data = {"session_id": self.session_ids(), "timestamp": self.timestamp.tolist()}
+        data.update({name: self.ids(name).tolist() for name in CATEGORY_COLUMNS})
+        data.update({name: getattr(self, name).tolist() for name in FLOAT_COLUMNS})
+        data["prescribed_duration"] = self.prescribed_duration.tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> "SessionFrame":
+        codes, categories = {}, {}
+        for name in CATEGORY_COLUMNS:
+            lookup: Dict[str, int] = {}
+            codes[name] = np.array([lookup.setdefault(v, len(lookup)) for v in data[name]], dtype=np.int32)
+            categories[name] = tuple(lookup)
+        return cls(
+            session_id=_encode_ids(data["session_id"]),
+            timestamp=np.array([datetime.fromisoformat(t) if isinstance(t, str) else t for t in data["timestamp"]],
+                               dtype="datetime64[us]").reshape(len(data["session_id"])),
+            codes=codes,
+            categories=categories,
+            prescribed_duration=np.asarray(data["prescribed_duration"], dtype=np.int32),
+            **{name: np.asarray(data[name], dtype=np.float64) for name in FLOAT_COLUMNS},
+        )
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> core_schema.CoreSchema:
+        # Lets aggregators holding frames validate and serialize like any pydantic field
+        return core_schema.no_info_plain_validator_function(
+            lambda value: value if isinstance(value, cls) else cls.from_dict(value),
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda frame: frame.to_dict()),
+        )
+
+def week_start_days(timestamps: np.ndarray) -> np.ndarray:
+    """Monday (datetime64[D]) of the week of each datetime64 timestamp"""
+    days = np.asarray(timestamps).astype("datetime64[D]").astype(np.int64)
+    # Day 0 (1970-01-01) was a Thursday: Monday-based weekday is (days + 3) % 7
+    return (days - (days + 3) % 7).astype("datetime64[D]")
+
+def as_session_frame(sessions: Union[Sequence[Session], SessionFrame]) -> SessionFrame:
+    return sessions if isinstance(sessions, SessionFrame) else SessionFrame.from_sessions(sessions)
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+def _narrow(codes: np.ndarray, size: int) -> np.ndarray:
+    # Narrowest unsigned codes for `size` categories (a patient's history rarely needs more than uint8)
+    return codes.astype(np.min_scalar_type(max(size - 1, 0)), copy=False)
+
+def _encode_ids(session_ids: Sequence[str]) -> np.ndarray:
+    # Fixed-width bytes: one allocation for every id instead of one str object per session
+    return np.array([sid.encode() for sid in session_ids], dtype=np.bytes_).reshape(len(session_ids))
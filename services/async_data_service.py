@@ -0,0 +1,169 @@
+# services/async_data_service.py
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from pydantic import BaseModel
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from services.data_db import (
+    Patient, PatientSession, PrescriptionUsage, SessionMetrics, WeeklyUsage, async_session_scope
+)
+from services.data_service import (
+    filter_session_metrics, patient_history_options, usage_query, weekly_usage_rows
+)
+
+T = TypeVar("T")
+
+class PatientHistory(BaseModel):
+    """A patient with their session metrics and per-prescription usage, fetched concurrently"""
+    patient: Patient
+    session_metrics: List[SessionMetrics]
+    prescription_usage: List[PrescriptionUsage]
+
+class AsyncPatientRepository:
+    """
+    asyncio counterpart of PatientRepository (same queries, awaited).
+
+    Without a caller session every call runs in its own `async_session_scope()`, so
+    independent calls can overlap; the `gather_*` methods do that for many patients
+    at once. A semaphore shared by every call of the repository caps the sessions
+    open at once at `concurrency`, however calls are nested (keep it at or below the pool size).
+    Relationships are never lazy-loaded in async code: ask for them with lazy_load=False.
+    """
+    def __init__(self, session: Optional[AsyncSession] = None, concurrency: int = 8):
+        """
+        Args:
+            session (Optional[AsyncSession]): Session owned by the caller. Calls then run
+                one at a time on it, and the gather methods run serially.
+            concurrency (int): Maximum number of queries in flight in the gather methods.
+        """
+        self.session = session
+        self.concurrency = concurrency
+        self._semaphore: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[AsyncSession]:
+        if self.session is not None:
+            yield self.session
+        else:
+            async with self._slot(), async_session_scope() as session:
+                yield session
+
+    def _slot(self) -> asyncio.Semaphore:
+        # One semaphore per event loop: asyncio primitives cannot be shared across loops
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            self._semaphore = (loop, asyncio.Semaphore(self.concurrency))
+        return self._semaphore[1]
+
+    async def get_all_patient_ids(self) -> List[str]:
+        """
+        Fetch all patient IDs from the database.
+        """
+        async with self._session() as session:
+            result = (await session.exec(select(Patient.patient_id))).all()
+        return [str(patient_id) for patient_id in result]
+
+    async def get_all_patients(self, lazy_load: bool = True) -> List[Patient]:
+        """
+        Fetch all patient records from the database.
+        """
+        statement = select(Patient)
+        if not lazy_load:
+            statement = statement.options(*patient_history_options())
+        async with self._session() as session:
+            return list((await session.exec(statement)).all())
+
+    async def iter_all_patients(self, batch_size: int = 500, lazy_load: bool = False) -> AsyncIterator[List[Patient]]:
+        """
+        Stream all patients in batches of `batch_size` from a server-side cursor.
+
+        Unlike PatientRepository.iter_all_patients, batches stay in the session's
+        identity map until it closes; pass no session to bound memory to the stream.
+        """
+        statement = select(Patient).order_by(Patient.patient_id).execution_options(yield_per=batch_size)
+        if not lazy_load:
+            statement = statement.options(*patient_history_options())
+        async with self._session() as session:
+            result = await session.stream_scalars(statement)
+            async for batch in result.partitions():
+                yield list(batch)
+
+    async def get_session_metrics(self, patient_id: Optional[str] = None,
+                                  session_ids: Optional[List[int]] = None) -> List[SessionMetrics]:
+        """
+        Fetch per-session metrics in a single query, without loading recordings.
+        """
+        statement = filter_session_metrics(patient_id, session_ids=session_ids).order_by(
+            PatientSession.starting_date, PatientSession.session_id
+        )
+        async with self._session() as session:
+            rows = (await session.exec(statement)).all()
+        return [SessionMetrics(**row._mapping) for row in rows]
+
+    async def get_prescription_usage(self, patient_id: Optional[str] = None,
+                                     prescription_ids: Optional[List[int]] = None) -> List[PrescriptionUsage]:
+        """
+        Sessions done, total duration, mean adherence and mean score per prescription.
+        """
+        statement = usage_query(filter_session_metrics(patient_id, prescription_ids))
+        async with self._session() as session:
+            rows = (await session.exec(statement)).all()
+        return [PrescriptionUsage(**row._mapping) for row in rows]
+
+    async def get_weekly_usage(self, patient_id: Optional[str] = None, prescription_ids: Optional[List[int]] = None,
+                               start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[WeeklyUsage]:
+        """
+        Same aggregates as get_prescription_usage, per prescription and ISO week.
+        """
+        statement = usage_query(filter_session_metrics(patient_id, prescription_ids, start, end), by_week=True)
+        async with self._session() as session:
+            rows = (await session.exec(statement)).all()
+        return weekly_usage_rows(rows)
+
+    async def get_patient(self, patient_id: str, lazy_load: bool = True) -> Patient:
+        """
+        Fetch a single patient record by patient_id (with their history unless lazy_load).
+        """
+        statement = select(Patient).where(Patient.patient_id == int(patient_id))
+        if not lazy_load:
+            statement = statement.options(*patient_history_options())
+        async with self._session() as session:
+            result = (await session.exec(statement)).first()
+        if not result:
+            raise ValueError(f"Patient with ID {patient_id} not found")
+        return result
+
+    async def get_patient_history(self, patient_id: str, lazy_load: bool = True) -> PatientHistory:
+        """The patient, their session metrics and their usage, as overlapping queries"""
+        patient, metrics, usage = await self._gather([
+            lambda: self.get_patient(patient_id, lazy_load=lazy_load),
+            lambda: self.get_session_metrics(patient_id),
+            lambda: self.get_prescription_usage(patient_id),
+        ])
+        return PatientHistory(patient=patient, session_metrics=metrics, prescription_usage=usage)
+
+    async def gather_patients(self, patient_ids: List[str], lazy_load: bool = True) -> List[Patient]:
+        """get_patient for many patients concurrently, in the order of patient_ids"""
+        return await self._gather([
+            lambda patient_id=patient_id: self.get_patient(patient_id, lazy_load=lazy_load)
+            for patient_id in patient_ids
+        ])
+
+    async def gather_histories(self, patient_ids: List[str], lazy_load: bool = True) -> Dict[str, PatientHistory]:
+        """get_patient_history for many patients concurrently, keyed by patient_id"""
+        histories = await self._gather([
+            lambda patient_id=patient_id: self.get_patient_history(patient_id, lazy_load=lazy_load)
+            for patient_id in patient_ids
+        ])
+        return dict(zip(map(str, patient_ids), histories))
+
+    async def _gather(self, calls: List[Callable[[], Awaitable[T]]]) -> List[T]:
+        if self.session is not None:
+            # One AsyncSession cannot run two statements at once
+            return [await call() for call in calls]
+        # Each call waits for a slot of the shared semaphore when it opens its session
+        return list(await asyncio.gather(*(call() for call in calls)))
@@ -0,0 +1,175 @@
+# services/cached_repository.py
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlmodel import Session
+
+from services.data_db import Patient, Prescription, PatientSession, SessionRecording
+from services.data_service import PatientRepository
+from utils.cache import LRUCache
+
+CacheKey = Tuple[Hashable, ...]
+
+# Seconds an entry of each kind stays valid; writes seen by the flush hook invalidate earlier
+DEFAULT_TTLS = {
+    "patient_ids": 60.0,
+    "patient": 300.0,
+    "session_metrics": 120.0,
+    "prescription_usage": 120.0,
+    "weekly_usage": 120.0,
+}
+
+# Group for entries that do not belong to a single patient (e.g. the patient id list)
+_ALL = "*"
+
+class CachedPatientRepository:
+    """
+    Read-through cache in front of a PatientRepository.
+
+    Results are kept in a bounded LRU with a TTL per kind of entity and grouped by
+    patient, so a write only drops the entries of the patients it touched. Writes are
+    picked up from committed ORM sessions (see `listen`) or reported explicitly with
+    `invalidate_patient`. One instance can be shared by every Streamlit session of
+    the process; cached objects are shared too and must be treated as read-only.
+    Methods that are not cached are passed through to the wrapped repository.
+    """
+    def __init__(self, repository: Optional[PatientRepository] = None, maxsize: int = 1024,
+                 ttls: Optional[Dict[str, float]] = None, clock: Optional[Callable[[], float]] = None):
+        self.repository = repository or PatientRepository()
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._lock = threading.RLock()
+        self._keys_by_patient: Dict[str, Set[CacheKey]] = defaultdict(set)
+        # Bumped on every invalidation, so a load that raced with a write is not cached
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._epoch = 0
+        cache_kwargs = {"clock": clock} if clock is not None else {}
+        self._cache = LRUCache(maxsize=maxsize, on_evict=self._forget_key, **cache_kwargs)
+        self._listening: List[object] = []
+
+    def __getattr__(self, name: str):
+        return getattr(self.repository, name)
+
+    def get_all_patient_ids(self) -> List[str]:
+        return self._cached(("patient_ids", _ALL), self.repository.get_all_patient_ids)
+
+    def get_patient(self, patient_id: str) -> Patient:
+        return self._cached(("patient", str(patient_id)), lambda: self.repository.get_patient(patient_id))
+
+    def get_session_metrics(self, patient_id: Optional[str] = None, session_ids: Optional[List[int]] = None):
+        if patient_id is None or session_ids is not None:
+            return self.repository.get_session_metrics(patient_id=patient_id, session_ids=session_ids)
+        return self._cached(("session_metrics", str(patient_id)),
+                            lambda: self.repository.get_session_metrics(patient_id=patient_id))
+
+    def get_prescription_usage(self, patient_id: Optional[str] = None,
+                               prescription_ids: Optional[List[int]] = None):
+        if patient_id is None or prescription_ids is not None:
+            return self.repository.get_prescription_usage(patient_id=patient_id, prescription_ids=prescription_ids)
+        return self._cached(("prescription_usage", str(patient_id)),
+                            lambda: self.repository.get_prescription_usage(patient_id=patient_id))
+
+    def get_weekly_usage(self, patient_id: Optional[str] = None, prescription_ids: Optional[List[int]] = None,
+                         start: Optional[datetime] = None, end: Optional[datetime] = None):
+        if patient_id is None or prescription_ids is not None:
+            return self.repository.get_weekly_usage(patient_id, prescription_ids, start, end)
+        return self._cached(("weekly_usage", str(patient_id), start, end),
+                            lambda: self.repository.get_weekly_usage(patient_id, start=start, end=end))
+
+    def invalidate_patient(self, patient_id: str):
+        """Drop everything cached for one patient (call after writing their data)"""
+        with self._lock:
+            self._generations[str(patient_id)] += 1
+            for key in self._keys_by_patient.pop(str(patient_id), set()):
+                self._cache.pop(key)
+
+    def invalidate_all(self):
+        with self._lock:
+            for patient_id in list(self._generations):
+                self._generations[patient_id] += 1
+            self._epoch += 1
+            self._cache.clear()
+            self._keys_by_patient.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+    def listen(self, target=Session):
+        """
+        Invalidate on commit for every patient touched by a flush of `target`.
+
+        `target` is a Session class, sessionmaker or session; the default covers
+        every sqlmodel Session in the process.
+        """
+        event.listen(target, "after_flush", self._collect_writes)
+        event.listen(target, "after_commit", self._apply_writes)
+        event.listen(target, "after_rollback", self._discard_writes)
+        self._listening.append(target)
+
+    def stop_listening(self):
+        for target in self._listening:
+            event.remove(target, "after_flush", self._collect_writes)
+            event.remove(target, "after_commit", self._apply_writes)
+            event.remove(target, "after_rollback", self._discard_writes)
+        self._listening.clear()
+
+    def _cached(self, key: CacheKey, load: Callable[[], object]):
+        # key[1] is always the patient_id (or _ALL). The repository lock is always taken before the
+        # LRU's: a read that expires an entry calls _forget_key while holding the LRU lock.
+        with self._lock:
+            value = self._cache.get(key)
+            generation = (self._epoch, self._generations[key[1]])
+        if value is None:
+            value = load()
+            with self._lock:
+                if generation == (self._epoch, self._generations[key[1]]):
+                    self._cache.put(key, value, ttl=self.ttls.get(key[0]))
+                    if key in self._cache:
+                        self._keys_by_patient[key[1]].add(key)
+        return value
+
+    def _forget_key(self, key: CacheKey, value):
+        with self._lock:
+            keys = self._keys_by_patient.get(key[1])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_patient[key[1]]
+
+    def _collect_writes(self, session: Session, flush_context):
+        touched = session.info.setdefault("cached_repository_writes", set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            patient_id = self._patient_of(session, obj)
+            if patient_id is not None:
+                touched.add(patient_id)
+            if isinstance(obj, Patient) and (obj in session.new or obj in session.deleted):
+                touched.add(_ALL)
+
+    def _apply_writes(self, session: Session):
+        # Only after commit: invalidating at flush time would let a concurrent read re-cache old rows
+        for patient_id in session.info.pop("cached_repository_writes", set()):
+            self.invalidate_patient(patient_id)
+
+    def _discard_writes(self, session: Session):
+        session.info.pop("cached_repository_writes", None)
+
+    def _patient_of(self, session: Session, obj) -> Optional[str]:
+        """patient_id owning a written object, without lazy-loading relationships"""
+        if isinstance(obj, SessionRecording):
+            obj = self._loaded_or_get(session, obj, "session", PatientSession, obj.session_id)
+        if isinstance(obj, PatientSession):
+            obj = self._loaded_or_get(session, obj, "prescription", Prescription, obj.prescription_id)
+        if isinstance(obj, (Patient, Prescription)):
+            return str(obj.patient_id)
+        return None
+
+    def _loaded_or_get(self, session: Session, obj, relationship: str, model, primary_key):
+        related = sa_inspect(obj).attrs[relationship].loaded_value
+        if isinstance(related, model):
+            return related
+        if primary_key is None:
+            return None
+        with session.no_autoflush:
+            return session.get(model, primary_key)
@@ -0,0 +1,194 @@
+# services/cohort_job.py
+"""
+Overnight job: score and plan the whole cohort in sharded worker processes.
+
+Each finished shard is written straight to its own columnar file (Parquet when
+pyarrow is installed, CSV otherwise) and recorded in a checkpoint, so an
+interrupted run resumes with the shards it had not finished.
+
+    python -m services.cohort_job --output output/plans --workers 8
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.patient import Patient
+from models.protocol import Protocol
+from services.planning import generate_weekly_plan
+from services.protocol_index import ProtocolFeatureIndex
+from services.scoring import CohortScorer
+from utils.config import Settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Fall back to CSV output
+    pa = None
+
+PLAN_COLUMNS = ["patient_id", "day", "slot", "protocol_id", "protocol_type", "score"]
+CHECKPOINT_FILE = "_checkpoint.json"
+
+# Per-process scorer, built once by the pool initializer
+_worker_scorer: Optional[CohortScorer] = None
+
+def run_cohort_job(patients: List[Patient], protocols: List[Protocol], output_dir: Path,
+                   motor_weight: float = Settings.SCORE_WEIGHTS["motor"],
+                   cognitive_weight: float = Settings.SCORE_WEIGHTS["cognitive"],
+                   shard_size: int = 500, workers: int = 1, output_format: Optional[str] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, object]:
+    """
+    Score and plan every patient, one output file per shard.
+
+    Args:
+        patients (List[Patient]): Cohort to process; sharded in patient_id order.
+        protocols (List[Protocol]): Protocol catalog.
+        output_dir (Path): Directory for shard files and the checkpoint.
+        motor_weight (float): Weight applied to the motor similarity.
+        cognitive_weight (float): Weight applied to the cognitive similarity.
+        shard_size (int): Patients per shard (and per task sent to a worker).
+        workers (int): Worker processes; 1 runs in-process.
+        output_format (Optional[str]): "parquet" or "csv"; defaults to parquet when pyarrow is available.
+        progress (Optional[Callable[[int, int], None]]): Called with (patients done, total) after each shard.
+
+    Returns:
+        Dict[str, object]: The final checkpoint (parameters and completed shard ids).
+    """
+    output_format = output_format or ("parquet" if pa is not None else "csv")
+    if output_format == "parquet" and pa is None:
+        raise ValueError("Parquet output requires pyarrow; use output_format='csv'")
+    progress = progress or _print_progress
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    patients = sorted(patients, key=lambda p: p.patient_id)
+    shards = [patients[i:i + shard_size] for i in range(0, len(patients), shard_size)]
+    index = ProtocolFeatureIndex(protocols)
+
+    checkpoint = _load_checkpoint(output_dir, {
+        "catalog_version": index.version,
+        "cohort": _cohort_hash(patients),
+        "motor_weight": motor_weight,
+        "cognitive_weight": cognitive_weight,
+        "shard_size": shard_size,
+        "format": output_format,
+    })
+    pending = [shard_id for shard_id in range(len(shards)) if shard_id not in checkpoint["completed"]]
+    done = sum(len(shards[shard_id]) for shard_id in checkpoint["completed"])
+    total = len(patients)
+
+    def finish(shard_id: int, columns: Dict[str, list]):
+        nonlocal done
+        _write_shard(output_dir / f"shard-{shard_id:05d}.{output_format}", columns, output_format)
+        checkpoint["completed"].append(shard_id)
+        _save_checkpoint(output_dir, checkpoint)
+        done += len(shards[shard_id])
+        progress(done, total)
+
+    if workers <= 1:
+        _init_worker(index)
+        for shard_id in pending:
+            finish(*_run_shard(shard_id, shards[shard_id], motor_weight, cognitive_weight))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(index,)) as pool:
+            futures = [
+                pool.submit(_run_shard, shard_id, shards[shard_id], motor_weight, cognitive_weight)
+                for shard_id in pending
+            ]
+            for future in as_completed(futures):
+                finish(*future.result())
+
+    return checkpoint
+
+def _init_worker(index: ProtocolFeatureIndex):
+    global _worker_scorer
+    _worker_scorer = CohortScorer(index)
+
+def _run_shard(shard_id: int, patients: List[Patient], motor_weight: float,
+               cognitive_weight: float) -> Tuple[int, Dict[str, list]]:
+    """Score and plan one shard, returning the plan as columns"""
+    ranked = _worker_scorer.score_cohort(patients, motor_weight, cognitive_weight)
+    columns = {column: [] for column in PLAN_COLUMNS}
+    for patient in patients:
+        weekly_plan = generate_weekly_plan(ranked[patient.patient_id])
+        for day, scheduled in weekly_plan.items():
+            for slot, protocol in enumerate(scheduled):
+                columns["patient_id"].append(patient.patient_id)
+                columns["day"].append(day)
+                columns["slot"].append(slot)
+                columns["protocol_id"].append(protocol["protocol_id"])
+                columns["protocol_type"].append(str(protocol["type"].value))
+                columns["score"].append(protocol["score"])
+    return shard_id, columns
+
+def _write_shard(path: Path, columns: Dict[str, list], output_format: str):
+    # Write to a temporary name first so a crash never leaves a truncated shard behind
+    tmp_path = path.with_name(path.name + ".tmp")
+    if output_format == "parquet":
+        pq.write_table(pa.table(columns), tmp_path)
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(PLAN_COLUMNS)
+            writer.writerows(zip(*(columns[column] for column in PLAN_COLUMNS)))
+    os.replace(tmp_path, path)
+
+def _load_checkpoint(output_dir: Path, params: Dict[str, object]) -> Dict[str, object]:
+    path = output_dir / CHECKPOINT_FILE
+    if not path.exists():
+        return {**params, "completed": []}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    mismatched = [key for key, value in params.items() if checkpoint.get(key) != value]
+    if mismatched:
+        raise ValueError(
+            f"Checkpoint in {output_dir} was written with different {', '.join(mismatched)}; "
+            "use a fresh output directory"
+        )
+    return checkpoint
+
+def _save_checkpoint(output_dir: Path, checkpoint: Dict[str, object]):
+    tmp_path = output_dir / (CHECKPOINT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, output_dir / CHECKPOINT_FILE)
+
+def _cohort_hash(patients: List[Patient]) -> str:
+    return hashlib.sha256("\n".join(p.patient_id for p in patients).encode()).hexdigest()[:16]
+
+def _print_progress(done: int, total: int):
+    print(f"[cohort_job] {done}/{total} patients")
+
+def _load_json_models(model, data_dir: Path) -> list:
+    models = []
+    for path in sorted(Path(data_dir).glob("*.json")):
+        with open(path) as f:
+            models.append(model(**json.load(f)))
+    return models
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute recommendations and weekly plans for the cohort")
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--patients-dir", type=Path, default=Settings.DATA_PATH / "patients")
+    parser.add_argument("--protocols-dir", type=Path, default=Settings.DATA_PATH / "protocols")
+    parser.add_argument("--motor-weight", type=float, default=Settings.SCORE_WEIGHTS["motor"])
+    parser.add_argument("--cognitive-weight", type=float, default=Settings.SCORE_WEIGHTS["cognitive"])
+    parser.add_argument("--shard-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--format", choices=["parquet", "csv"], default=None)
+    args = parser.parse_args()
+
+    run_cohort_job(
+        _load_json_models(Patient, args.patients_dir),
+        _load_json_models(Protocol, args.protocols_dir),
+        args.output,
+        motor_weight=args.motor_weight,
+        cognitive_weight=args.cognitive_weight,
+        shard_size=args.shard_size,
+        workers=args.workers,
+        output_format=args.format,
+    )
@@ -1,9 +1,18 @@
 # services/data_db.py
 from sqlmodel import SQLModel, Session, Field, Index, create_engine, select, Relationship
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.pool import StaticPool
+from contextlib import asynccontextmanager, contextmanager
 from enum import Enum
+import threading
 from datetime import datetime, date
-from typing import List, Dict, Optional, Any
-from pydantic import computed_field
+from typing import AsyncIterator, List, Dict, Optional, Any, Iterator
+from pydantic import PrivateAttr, computed_field
+from utils.config import Settings
 
 # from models.patient import ClinicalScores
 # import pandas as pd
@@ -81,20 +90,37 @@ class PatientSession(SQLModel, table=True):
     # difficulty_modulators: List["DifficultyModulator"] = Relationship(back_populates="session")
     # performance_estimators: List["PerformanceEstimator"] = Relationship(back_populates="session")
 
+    # recording_key -> recording_value, built on first metric access (see recording_index)
+    _recording_index: Optional[Dict[str, int]] = PrivateAttr(default=None)
+
+    @property
+    def recording_index(self) -> Dict[str, int]:
+        """
+        Recording values by key, built once from the loaded recordings.
+
+        Dropped again whenever the recordings collection or a recording's key/value changes.
+        """
+        if self._recording_index is None:
+            index = {}
+            for r in self.recordings:
+                # Plain-string keys (a RecordingKey member hashes by name); first recording of a key wins
+                key = r.recording_key.value if isinstance(r.recording_key, RecordingKey) else r.recording_key
+                index.setdefault(key, r.recording_value)
+            self._recording_index = index
+        return self._recording_index
+
+    def invalidate_recording_index(self):
+        self._recording_index = None
+
     @computed_field
     @property
     def score(self) -> Optional[int]:
-        return next((r.recording_value for r in self.recordings
-                   if r.recording_key == RecordingKey.SCORE), None)
+        return self.recording_index.get(RecordingKey.SCORE.value)
 
     @computed_field
     @property
     def duration(self) -> Optional[int]:
-        duration_value = next(
-            (r.recording_value for r in self.recordings
-            if r.recording_key == RecordingKey.SESSION_DURATION),
-            None
-        )
+        duration_value = self.recording_index.get(RecordingKey.SESSION_DURATION.value)
         return int(duration_value) if duration_value is not None else None
 
     @computed_field
@@ -113,6 +139,69 @@ class SessionRecording(SQLModel, table=True):
 
     session: PatientSession = Relationship(back_populates="recordings")
 
+# ----- Recording index invalidation -----
+@event.listens_for(PatientSession, "load")
+@event.listens_for(PatientSession, "refresh")
+def _init_recording_index(target: PatientSession, *args):
+    # ORM-loaded instances skip pydantic's __init__, so their private attributes start unset
+    if target.__pydantic_private__ is None:
+        target.__pydantic_private__ = {"_recording_index": None}
+    else:
+        target.invalidate_recording_index()
+
+@event.listens_for(PatientSession, "expire")
+def _expire_recording_index(target: PatientSession, attrs):
+    # target is None when the instance was already garbage collected
+    if getattr(target, "__pydantic_private__", None) is not None and (attrs is None or "recordings" in attrs):
+        target.invalidate_recording_index()
+
+@event.listens_for(PatientSession.recordings, "append")
+@event.listens_for(PatientSession.recordings, "remove")
+def _recordings_changed(target: PatientSession, *args):
+    target.invalidate_recording_index()
+
+@event.listens_for(SessionRecording.recording_key, "set")
+@event.listens_for(SessionRecording.recording_value, "set")
+def _recording_changed(target: SessionRecording, *args):
+    # Only a session already in memory can hold an index; never lazy-load it here.
+    # Collections loaded from the session side leave the backref unset, so fall back to the identity map.
+    state = sa_inspect(target)
+    session = state.attrs.session.loaded_value
+    if not isinstance(session, PatientSession) and state.session is not None:
+        session = state.session.identity_map.get(identity_key(PatientSession, target.session_id))
+    if isinstance(session, PatientSession) and session.__pydantic_private__ is not None:
+        session.invalidate_recording_index()
+
+# ----- Read Models -----
+class SessionMetrics(SQLModel):
+    """Compact per-session record pivoted from recording_plus in SQL"""
+    session_id: int
+    prescription_id: int
+    patient_id: int
+    protocol_id: int
+    starting_date: datetime
+    score: Optional[int] = None
+    duration: Optional[int] = None
+    errors: Optional[int] = None
+    successes: Optional[int] = None
+    adherence: Optional[float] = Field(default=None, description="duration / prescribed session_duration")
+
+class PrescriptionUsage(SQLModel):
+    """Per-prescription usage aggregated in SQL over session metrics"""
+    prescription_id: int
+    patient_id: int
+    protocol_id: int
+    sessions_done: int
+    total_duration: Optional[int] = None
+    mean_adherence: Optional[float] = None
+    mean_score: Optional[float] = None
+
+class WeeklyUsage(PrescriptionUsage):
+    """PrescriptionUsage restricted to one ISO week (Monday to Sunday)"""
+    week_start: date
+    iso_year: int
+    iso_week: int
+
 # class DifficultyModulator(SQLModel, table=True):
 #     __tablename__ = "difficulty_modulators_plus"
 
@@ -241,19 +330,108 @@ class SessionRecording(SQLModel, table=True):
 #             "ewma_performance": latest_values["ewma_performance"]
 #         }
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
-
-DB_USER="db_readOnly_prod"
-DB_PASS="12345aA."
-DB_HOST="rgsweb.eodyne.com"
-DB_NAME="global_prod"
-
-# Create the engine
-connection_string = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
-engine = create_engine(connection_string, echo=False)
+# --------------------------
+#  Engine and Sessions
+# --------------------------
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> Engine:
+    """Process-wide engine, created on first use from Settings"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = build_engine(Settings.DATABASE_URL)
+    return _engine
+
+def build_engine(url: str) -> Engine:
+    """Engine with the pool settings from Settings; SQLite (local stand-in) uses its own pooling"""
+    return create_engine(url, **_engine_kwargs(url))
+
+def _engine_kwargs(url: str) -> Dict[str, Any]:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        kwargs = {"echo": Settings.DB_ECHO, "connect_args": {"check_same_thread": False}}
+        if parsed.database in (None, "", ":memory:"):
+            # An in-memory database lives in one connection, shared by every session
+            kwargs["poolclass"] = StaticPool
+        return kwargs
+    return {
+        "echo": Settings.DB_ECHO,
+        "pool_size": Settings.DB_POOL_SIZE,
+        "max_overflow": Settings.DB_MAX_OVERFLOW,
+        "pool_pre_ping": Settings.DB_POOL_PRE_PING,
+        "pool_recycle": Settings.DB_POOL_RECYCLE,
+    }
+
+def reset_engine():
+    """Dispose the current engines; the next get_engine()/get_async_engine() rebuild them from Settings"""
+    global _engine, _async_engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        if _async_engine is not None:
+            # Closing async connections needs the event loop they belong to; just drop the pool
+            _async_engine.sync_engine.dispose(close=False)
+        _engine = None
+        _async_engine = None
+
+def async_database_url(url: str) -> str:
+    """The async-driver equivalent of a sync database URL"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "mysql":
+        return parsed.set(drivername="mysql+aiomysql").render_as_string(hide_password=False)
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return url
+
+def get_async_engine() -> AsyncEngine:
+    """Process-wide async engine (aiomysql in production, aiosqlite locally), created on first use"""
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                url = Settings.ASYNC_DATABASE_URL or async_database_url(Settings.DATABASE_URL)
+                _async_engine = create_async_engine(url, **_engine_kwargs(url))
+    return _async_engine
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Request-scoped session: commits on success, rolls back on error, always closes.
+
+    Objects keep their loaded attributes after the scope ends (expire_on_commit=False),
+    but relationships that were not eager-loaded cannot be lazy-loaded anymore.
+    """
+    session = Session(get_engine(), expire_on_commit=False)
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+@asynccontextmanager
+async def async_session_scope() -> AsyncIterator[AsyncSession]:
+    """Async counterpart of session_scope(); one per task, AsyncSession is not concurrency-safe"""
+    session = AsyncSession(get_async_engine(), expire_on_commit=False)
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+def create_db_and_tables(engine: Optional[Engine] = None):
+    SQLModel.metadata.create_all(engine or get_engine())
 
 # Example usage
 if __name__ == "__main__":
     create_db_and_tables()
-    
\ No newline at end of file
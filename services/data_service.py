@@ -6,10 +6,19 @@ from collections import defaultdict
 # from models.patient import Patient
 # from models.protocol import Protocol
 # from models.session import Prescription, Session
+from contextlib import contextmanager
 from sqlmodel import Session, select
+from datetime import date, datetime
+from sqlalchemy import Date, Float, case, cast, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 from sqlalchemy.orm import selectinload, joinedload
-from typing import List
-from services.data_db import Patient, Prescription, PatientSession  # Import your SQLModel classes
+from sqlalchemy.sql import Select
+from typing import Iterator, List, Optional
+from services.data_db import (  # Import your SQLModel classes
+    Patient, Prescription, PatientSession, SessionRecording, SessionMetrics, PrescriptionUsage, WeeklyUsage,
+    RecordingKey, session_scope
+)
 
 # class PatientRepositoryLocal:
 #     def __init__(self, data_dir="data/patients", session_dir="data/sessions", prescription_dir="data/prescriptions"):
@@ -87,16 +96,144 @@ from services.data_db import Patient, Prescription, PatientSession  # Import you
 #         with open(protocol_path) as f:
 #             return Protocol(**json.load(f))
         
+def _recording(key: RecordingKey):
+    """Conditional aggregation: the value of one recording_key within a session group"""
+    return func.max(case((SessionRecording.recording_key == key.value, SessionRecording.recording_value)))
+
+def session_metrics_query() -> Select:
+    """
+    One row per session with its recordings pivoted into columns (see SessionMetrics).
+
+    Filter it with `.where(...)` on Prescription/PatientSession columns, or use it as
+    a subquery for further aggregation.
+    """
+    duration = _recording(RecordingKey.SESSION_DURATION)
+    return (
+        select(
+            PatientSession.session_id,
+            PatientSession.prescription_id,
+            Prescription.patient_id,
+            Prescription.protocol_id,
+            PatientSession.starting_date,
+            _recording(RecordingKey.SCORE).label("score"),
+            duration.label("duration"),
+            _recording(RecordingKey.TOTAL_ERRORS).label("errors"),
+            _recording(RecordingKey.TOTAL_SUCCESS).label("successes"),
+            (cast(duration, Float) / func.nullif(Prescription.session_duration, 0)).label("adherence"),
+        )
+        .join(Prescription, Prescription.prescription_id == PatientSession.prescription_id)
+        .outerjoin(SessionRecording, SessionRecording.session_id == PatientSession.session_id)
+        .group_by(
+            PatientSession.session_id,
+            PatientSession.prescription_id,
+            Prescription.patient_id,
+            Prescription.protocol_id,
+            PatientSession.starting_date,
+            Prescription.session_duration,
+        )
+    )
+
+class week_start(FunctionElement):
+    """Monday (as a DATE) of the ISO week containing a datetime expression"""
+    type = Date()
+    inherit_cache = True
+    name = "week_start"
+
+@compiles(week_start)
+def _week_start_default(element, compiler, **kw):
+    return "CAST(date_trunc('week', %s) AS DATE)" % compiler.process(element.clauses, **kw)
+
+@compiles(week_start, "mysql")
+def _week_start_mysql(element, compiler, **kw):
+    value = compiler.process(element.clauses, **kw)
+    return "DATE(DATE_SUB(%s, INTERVAL WEEKDAY(%s) DAY))" % (value, value)
+
+@compiles(week_start, "sqlite")
+def _week_start_sqlite(element, compiler, **kw):
+    # strftime('%%w') counts from Sunday = 0; shift so Monday = 0
+    value = compiler.process(element.clauses, **kw)
+    return "date(%s, '-' || ((CAST(strftime('%%w', %s) AS INTEGER) + 6) %% 7) || ' days')" % (value, value)
+
+def usage_query(metrics: Select, by_week: bool = False) -> Select:
+    """
+    Aggregate a (filtered) session_metrics_query() per prescription, and per week if by_week.
+
+    Columns match PrescriptionUsage, plus week_start when by_week.
+    """
+    metrics = metrics.subquery()
+    keys = [metrics.c.prescription_id, metrics.c.patient_id, metrics.c.protocol_id]
+    if by_week:
+        keys.append(week_start(metrics.c.starting_date).label("week_start"))
+    return (
+        select(
+            *keys,
+            func.count(metrics.c.session_id).label("sessions_done"),
+            func.sum(metrics.c.duration).label("total_duration"),
+            func.avg(metrics.c.adherence).label("mean_adherence"),
+            func.avg(metrics.c.score).label("mean_score"),
+        )
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+
+def patient_history_options() -> tuple:
+    """Loader options that selectin-load prescriptions -> sessions -> recordings with each patient"""
+    return (
+        selectinload(Patient.prescriptions).selectinload(Prescription.sessions).selectinload(PatientSession.recordings),
+    )
+
+def filter_session_metrics(patient_id: Optional[str] = None, prescription_ids: Optional[List[int]] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           session_ids: Optional[List[int]] = None) -> Select:
+    """session_metrics_query() restricted to a patient, prescriptions, sessions and/or a time range"""
+    # Filters go on the per-session query, before any grouping
+    statement = session_metrics_query()
+    if patient_id is not None:
+        statement = statement.where(Prescription.patient_id == int(patient_id))
+    if prescription_ids is not None:
+        statement = statement.where(PatientSession.prescription_id.in_(prescription_ids))
+    if session_ids is not None:
+        statement = statement.where(PatientSession.session_id.in_(session_ids))
+    if start is not None:
+        statement = statement.where(PatientSession.starting_date >= start)
+    if end is not None:
+        statement = statement.where(PatientSession.starting_date < end)
+    return statement
+
+def weekly_usage_rows(rows) -> List[WeeklyUsage]:
+    """WeeklyUsage models from usage_query(..., by_week=True) rows"""
+    usage = []
+    for row in rows:
+        # SQLite hands the DATE back as text
+        week = row.week_start if isinstance(row.week_start, date) else date.fromisoformat(str(row.week_start))
+        iso_year, iso_week, _ = week.isocalendar()
+        usage.append(WeeklyUsage(**{**row._mapping, "week_start": week}, iso_year=iso_year, iso_week=iso_week))
+    return usage
+
 class PatientRepository:
-    def __init__(self, session: Session):
+    def __init__(self, session: Optional[Session] = None):
+        """
+        Args:
+            session (Optional[Session]): Session owned by the caller. Without one, every
+                call runs in its own `session_scope()` and returns detached objects.
+        """
         self.session = session
 
+    @contextmanager
+    def _session(self) -> Iterator[Session]:
+        if self.session is not None:
+            yield self.session
+        else:
+            with session_scope() as session:
+                yield session
+
     def get_all_patient_ids(self) -> List[str]:
         """
         Fetch all patient IDs from the database.
         """
         statement = select(Patient.patient_id)
-        result = self.session.exec(statement).all()
+        with self._session() as session:
+            result = session.exec(statement).all()
         return [str(patient_id) for patient_id in result]
 
     def get_all_patients(self, lazy_load=True) -> List[Patient]:
@@ -105,18 +242,102 @@ class PatientRepository:
         """
         statement = select(Patient)
         if not lazy_load:
-            statement = statement.options(
-                selectinload(Patient.prescriptions).selectinload(Prescription.sessions).selectinload(PatientSession.recordings)
-            )
-        result = self.session.exec(statement).all()
+            statement = statement.options(*patient_history_options())
+        with self._session() as session:
+            result = session.exec(statement).all()
         return result
 
+    def iter_all_patients(self, batch_size: int = 500, lazy_load: bool = False) -> Iterator[List[Patient]]:
+        """
+        Stream all patients in batches of `batch_size`, with bounded memory.
+
+        Rows come from a server-side cursor (`yield_per`) and, unless lazy_load, the
+        prescriptions -> sessions -> recordings chain is selectin-loaded per batch.
+        Each batch is removed from the session once the consumer asks for the next one.
+        """
+        statement = select(Patient).order_by(Patient.patient_id).execution_options(yield_per=batch_size)
+        if not lazy_load:
+            statement = statement.options(*patient_history_options())
+        with self._session() as session:
+            for batch in session.exec(statement).partitions():
+                yield batch
+                self._release(session, batch, eager=not lazy_load)
+
+    def _release(self, session: Session, patients: List[Patient], eager: bool):
+        """Drop a streamed batch (and its eager-loaded children) from the identity map"""
+        # Per object: expunge_all() would invalidate the identity map the cursor still loads into
+        for patient in patients:
+            if eager:
+                for prescription in patient.prescriptions:
+                    for patient_session in prescription.sessions:
+                        for recording in patient_session.recordings:
+                            session.expunge(recording)
+                        session.expunge(patient_session)
+                    session.expunge(prescription)
+            session.expunge(patient)
+
+    def get_session_metrics(self, patient_id: Optional[str] = None,
+                            session_ids: Optional[List[int]] = None) -> List[SessionMetrics]:
+        """
+        Fetch per-session metrics in a single query, without loading recordings.
+
+        Args:
+            patient_id (Optional[str]): Only this patient's sessions.
+            session_ids (Optional[List[int]]): Only these sessions.
+
+        Returns:
+            List[SessionMetrics]: Ordered by session start.
+        """
+        statement = filter_session_metrics(patient_id, session_ids=session_ids).order_by(
+            PatientSession.starting_date, PatientSession.session_id
+        )
+        with self._session() as session:
+            rows = session.exec(statement).all()
+        return [SessionMetrics(**row._mapping) for row in rows]
+
+    def get_prescription_usage(self, patient_id: Optional[str] = None,
+                               prescription_ids: Optional[List[int]] = None) -> List[PrescriptionUsage]:
+        """
+        Sessions done, total duration, mean adherence and mean score per prescription.
+
+        Args:
+            patient_id (Optional[str]): Only this patient's prescriptions.
+            prescription_ids (Optional[List[int]]): Only these prescriptions.
+
+        Returns:
+            List[PrescriptionUsage]: Ordered by prescription_id.
+        """
+        statement = usage_query(filter_session_metrics(patient_id, prescription_ids))
+        with self._session() as session:
+            rows = session.exec(statement).all()
+        return [PrescriptionUsage(**row._mapping) for row in rows]
+
+    def get_weekly_usage(self, patient_id: Optional[str] = None, prescription_ids: Optional[List[int]] = None,
+                         start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[WeeklyUsage]:
+        """
+        Same aggregates as get_prescription_usage, per prescription and ISO week.
+
+        Args:
+            patient_id (Optional[str]): Only this patient's prescriptions.
+            prescription_ids (Optional[List[int]]): Only these prescriptions.
+            start (Optional[datetime]): Only sessions starting at or after this time.
+            end (Optional[datetime]): Only sessions starting before this time.
+
+        Returns:
+            List[WeeklyUsage]: Ordered by prescription_id, then week.
+        """
+        statement = usage_query(filter_session_metrics(patient_id, prescription_ids, start, end), by_week=True)
+        with self._session() as session:
+            rows = session.exec(statement).all()
+        return weekly_usage_rows(rows)
+
     def get_patient(self, patient_id: str) -> Patient:
         """
         Fetch a single patient record by patient_id.
         """
         statement = select(Patient).where(Patient.patient_id == int(patient_id))
-        result = self.session.exec(statement).first()
+        with self._session() as session:
+            result = session.exec(statement).first()
         if not result:
             raise ValueError(f"Patient with ID {patient_id} not found")
         return result
\ No newline at end of file
@@ -0,0 +1,357 @@
+# services/planning.py
+import heapq
+from collections import deque
+from datetime import date, timedelta
+from typing import Deque, Dict, List, Optional, Sequence, Set, Tuple
+from pydantic import BaseModel, Field, field_validator
+from models.protocol import ProtocolType
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Protocol types the scheduler places; balanced protocols fit motor and cognitive slots alike
+SCHEDULED_GROUPS = (ProtocolType.MOTOR, ProtocolType.COGNITIVE, ProtocolType.BALANCED)
+
+class PlanConfig(BaseModel):
+    """Slot counts and motor/cognitive balance of generated plans"""
+    slots_per_day: int = Field(default=4, ge=0, description="Activities scheduled per day")
+    day_slots: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Per-day overrides of slots_per_day (e.g. {'Sunday': 0})"
+    )
+    focus_cycle: List[ProtocolType] = Field(
+        default_factory=lambda: [ProtocolType.MOTOR, ProtocolType.COGNITIVE],
+        description="Focus type of consecutive days (motor, cognitive or balanced), repeated over the plan"
+    )
+    focus_share: float = Field(
+        default=1.0, ge=0, le=1,
+        description="Share of a day's slots that prefer the focus type; the rest prefer the other type"
+    )
+
+    @field_validator('focus_cycle')
+    def check_focus_cycle(cls, value):
+        if not value:
+            raise ValueError("focus_cycle needs at least one day")
+        unscheduled = [focus.value for focus in value if focus not in SCHEDULED_GROUPS]
+        if unscheduled:
+            raise ValueError(f"focus_cycle may only hold motor, cognitive or balanced, got {unscheduled}")
+        return value
+
+    def slots_for(self, day: str) -> int:
+        return self.day_slots.get(day, self.slots_per_day)
+
+    def focus_for(self, day_offset: int) -> ProtocolType:
+        return self.focus_cycle[day_offset % len(self.focus_cycle)]
+
+class UsageState(BaseModel):
+    """How often a protocol was scheduled and the first day it may be scheduled again"""
+    uses: int = 0
+    available_from: int = 0
+
+class WeeklyScheduler:
+    """
+    Greedy, constraint-aware scheduler over a score-ranked protocol list.
+
+    Each slot takes the best-ranked protocol of its preferred type that is free
+    that day: never-scheduled protocols first, then already scheduled ones (fewest
+    uses first) once their `min_rest_period` has passed. A protocol is repeated
+    within a day at most `max_daily_frequency` times. Balanced protocols are
+    eligible for both motor and cognitive slots; assessments are not scheduled.
+
+    Splitting the ranking into per-type queues is O(n); every slot then costs
+    O(log S) heap work over the at most S protocols already scheduled, so a plan
+    is linear in the number of scored protocols.
+    """
+    def __init__(self, config: Optional[PlanConfig] = None):
+        self.config = config or PlanConfig()
+
+    def schedule(self, scored_protocols: List[Dict], days: Sequence[str] = WEEKDAYS) -> Dict[str, List[Dict]]:
+        """Plan `days` (focus follows their position) from protocols sorted by descending score"""
+        placements = self.schedule_days(scored_protocols, days)
+        return {day: [scored_protocols[rank] for rank in ranks] for day, ranks in zip(days, placements)}
+
+    def schedule_days(self, scored_protocols: List[Dict], days: Sequence[str], first_day: int = 0,
+                      usage: Optional[Dict[str, UsageState]] = None) -> List[List[int]]:
+        """
+        Core scheduling loop.
+
+        Args:
+            scored_protocols (List[Dict]): Protocol payloads sorted by descending score.
+            days (Sequence[str]): Day names, used for slot counts.
+            first_day (int): Day offset of days[0]; focus and rest periods are counted in offsets.
+            usage (Optional[Dict[str, UsageState]]): Usage before first_day by protocol_id; it is
+                updated in place with this run's placements.
+
+        Returns:
+            List[List[int]]: For every day, the ranks (positions in scored_protocols) placed.
+        """
+        usage = {} if usage is None else usage
+        fresh: Dict[ProtocolType, Deque[int]] = {group: deque() for group in SCHEDULED_GROUPS}
+        ready: Dict[ProtocolType, List[Tuple[int, int, int]]] = {group: [] for group in SCHEDULED_GROUPS}
+        waiting: List[Tuple[int, int]] = []  # (available_from, rank)
+        stamps: Dict[int, int] = {}  # invalidates ready entries of protocols that went to rest
+        groups: Dict[int, ProtocolType] = {}
+        constraints: Dict[int, Tuple[int, int]] = {}
+
+        for rank, protocol in enumerate(scored_protocols):
+            group = ProtocolType(protocol["type"])
+            if group not in fresh:
+                continue
+            groups[rank] = group
+            safety = protocol.get("safety_constraints") or {}
+            constraints[rank] = (safety.get("max_daily_frequency", 1), safety.get("min_rest_period", 0))
+            state = usage.get(protocol["protocol_id"])
+            if state is None or state.uses == 0:
+                fresh[group].append(rank)
+            else:
+                stamps[rank] = 0
+                heapq.heappush(waiting, (state.available_from, rank))
+
+        def take(candidate_groups: Sequence[ProtocolType]) -> Optional[int]:
+            # Never-scheduled protocols first, best rank across the candidate groups
+            heads = [(fresh[g][0], g) for g in candidate_groups if fresh[g]]
+            if heads:
+                rank, group = min(heads)
+                fresh[group].popleft()
+                return rank
+            # Then protocols coming back from rest: fewest uses, then best rank
+            best = None
+            for group in candidate_groups:
+                heap = ready[group]
+                while heap and heap[0][2] != stamps[heap[0][1]]:
+                    heapq.heappop(heap)  # stale entry
+                if heap and (best is None or heap[0] < ready[best][0]):
+                    best = group
+            if best is None:
+                return None
+            return heapq.heappop(ready[best])[1]
+
+        placements = []
+        for offset, day_name in enumerate(days):
+            day = first_day + offset
+            while waiting and waiting[0][0] <= day:
+                _, rank = heapq.heappop(waiting)
+                state = usage[scored_protocols[rank]["protocol_id"]]
+                heapq.heappush(ready[groups[rank]], (state.uses, rank, stamps[rank]))
+
+            focus = self.config.focus_for(day)
+            slots = self.config.slots_for(day_name)
+            focus_slots = round(self.config.focus_share * slots)
+            placed: List[int] = []
+            used_today: Dict[int, int] = {}
+
+            for slot in range(slots):
+                rank = None
+                for candidate_groups in slot_preferences(focus, slot < focus_slots):
+                    rank = take(candidate_groups)
+                    if rank is not None:
+                        break
+                if rank is None:
+                    break  # Nothing left that may be scheduled today
+
+                placed.append(rank)
+                used_today[rank] = used_today.get(rank, 0) + 1
+                state = usage.setdefault(scored_protocols[rank]["protocol_id"], UsageState())
+                state.uses += 1
+                stamps[rank] = stamps.get(rank, 0)
+                max_daily_frequency, _ = constraints[rank]
+                if used_today[rank] < max_daily_frequency:
+                    heapq.heappush(ready[groups[rank]], (state.uses, rank, stamps[rank]))
+
+            # Everything scheduled today rests for min_rest_period full days
+            for rank in used_today:
+                _, min_rest_period = constraints[rank]
+                state = usage[scored_protocols[rank]["protocol_id"]]
+                state.available_from = day + min_rest_period + 1
+                stamps[rank] += 1
+                heapq.heappush(waiting, (state.available_from, rank))
+            placements.append(placed)
+
+        return placements
+
+def slot_preferences(focus: ProtocolType, in_focus: bool) -> Tuple[Tuple[ProtocolType, ...], ...]:
+    """Candidate groups a slot takes from, tried in order"""
+    if focus == ProtocolType.BALANCED:
+        # A balanced day prefers no type: the best-ranked protocol of any scheduled type
+        return (SCHEDULED_GROUPS,)
+    other = ProtocolType.COGNITIVE if focus == ProtocolType.MOTOR else ProtocolType.MOTOR
+    preferred, second = (focus, other) if in_focus else (other, focus)
+    return ((preferred, ProtocolType.BALANCED), (second, ProtocolType.BALANCED))
+
+def generate_weekly_plan(scored_protocols: List[Dict], config: Optional[PlanConfig] = None) -> Dict[str, List[Dict]]:
+    """Distribute protocols across the week, balancing motor and cognitive activities."""
+    return WeeklyScheduler(config).schedule(scored_protocols)
+
+class PlannedProtocol(BaseModel):
+    """The parts of a scored protocol a persisted plan needs to replan"""
+    protocol_id: str
+    type: ProtocolType
+    max_daily_frequency: int = 1
+    min_rest_period: int = 0
+
+    @classmethod
+    def from_scored(cls, protocol: Dict) -> "PlannedProtocol":
+        safety = protocol.get("safety_constraints") or {}
+        return cls(
+            protocol_id=protocol["protocol_id"],
+            type=protocol["type"],
+            max_daily_frequency=safety.get("max_daily_frequency", 1),
+            min_rest_period=safety.get("min_rest_period", 0),
+        )
+
+    def as_scored(self) -> Dict:
+        return {
+            "protocol_id": self.protocol_id,
+            "type": self.type,
+            "safety_constraints": {
+                "max_daily_frequency": self.max_daily_frequency,
+                "min_rest_period": self.min_rest_period,
+            },
+        }
+
+class RollingPlan(BaseModel):
+    """
+    Persistable N-week plan that is replanned only where something changed.
+
+    Days are addressed by their offset from `start_date`. Logged sessions replace
+    the planned activities of their day, and clinician-edited days are pinned; both
+    are kept as they are and count towards rest periods of the days after them.
+    Every change replans its own days, then walks forward only as long as the
+    following days break a rest period, so its cost depends on the change and the
+    longest `min_rest_period`, not on the horizon.
+    """
+    start_date: date
+    config: PlanConfig = Field(default_factory=PlanConfig)
+    protocols: List[PlannedProtocol] = Field(default_factory=list, description="Current ranking, best first")
+    days: List[List[str]] = Field(default_factory=list, description="Planned protocol_ids per day offset")
+    sessions: Dict[int, List[str]] = Field(default_factory=dict, description="Logged protocol_ids per day offset")
+    pinned: Set[int] = Field(default_factory=set, description="Day offsets edited by a clinician")
+
+    @classmethod
+    def create(cls, scored_protocols: List[Dict], start_date: date, weeks: int,
+               config: Optional[PlanConfig] = None) -> "RollingPlan":
+        plan = cls(
+            start_date=start_date,
+            config=config or PlanConfig(),
+            protocols=[PlannedProtocol.from_scored(p) for p in scored_protocols],
+        )
+        plan.extend(weeks)
+        return plan
+
+    @property
+    def end_date(self) -> date:
+        return self.start_date + timedelta(days=len(self.days) - 1)
+
+    def plan_for(self, day: date) -> List[str]:
+        """Protocol ids of a day: logged sessions when there are any, the plan otherwise"""
+        return self._occurrences(self._offset(day))
+
+    def extend(self, weeks: int = 1) -> List[int]:
+        """Append weeks to the horizon, planning only the new days"""
+        first = len(self.days)
+        self.days.extend([] for _ in range(7 * weeks))
+        return self._plan_range(first, len(self.days))
+
+    def update_scores(self, scored_protocols: List[Dict], start: date, end: Optional[date] = None) -> List[int]:
+        """Adopt a new ranking and replan [start, end] (default: the week starting at start)"""
+        self.protocols = [PlannedProtocol.from_scored(p) for p in scored_protocols]
+        first = self._offset(start)
+        last = self._offset(end) if end else min(first + 6, len(self.days) - 1)
+        replanned = self._plan_range(first, last + 1)
+        return replanned + self._repair_after(last)
+
+    def edit_day(self, day: date, protocol_ids: List[str]) -> List[int]:
+        """Pin a clinician's plan for one day and repair the days its rest periods reach"""
+        offset = self._offset(day)
+        self.days[offset] = list(protocol_ids)
+        self.pinned.add(offset)
+        return self._repair_after(offset)
+
+    def record_session(self, protocol_id: str, day: date) -> List[int]:
+        """Log a performed session; later days are repaired if it breaks their rest periods"""
+        offset = self._offset(day)
+        self.sessions.setdefault(offset, []).append(protocol_id)
+        return self._repair_after(offset)
+
+    def _offset(self, day: date) -> int:
+        offset = (day - self.start_date).days
+        if not 0 <= offset < len(self.days):
+            raise ValueError(f"{day} is outside the plan horizon ({self.start_date} - {self.end_date})")
+        return offset
+
+    def _occurrences(self, offset: int) -> List[str]:
+        return self.sessions[offset] if offset in self.sessions else self.days[offset]
+
+    def _replannable(self, offset: int) -> bool:
+        return offset not in self.pinned and offset not in self.sessions
+
+    def _constraints(self) -> Dict[str, PlannedProtocol]:
+        return {p.protocol_id: p for p in self.protocols}
+
+    def _lookback(self, constraints: Dict[str, PlannedProtocol]) -> int:
+        # Long enough for every rest period, and a week so "fresh" means not used recently
+        return max([p.min_rest_period + 1 for p in constraints.values()] + [7])
+
+    def _usage_before(self, offset: int, constraints: Dict[str, PlannedProtocol]) -> Dict[str, UsageState]:
+        usage: Dict[str, UsageState] = {}
+        for day in range(max(0, offset - self._lookback(constraints)), offset):
+            self._apply_usage(usage, day, self._occurrences(day), constraints)
+        return usage
+
+    def _apply_usage(self, usage: Dict[str, UsageState], offset: int, protocol_ids: List[str],
+                     constraints: Dict[str, PlannedProtocol]):
+        for protocol_id in protocol_ids:
+            state = usage.setdefault(protocol_id, UsageState())
+            state.uses += 1
+            rest = constraints[protocol_id].min_rest_period if protocol_id in constraints else 0
+            state.available_from = offset + rest + 1
+
+    def _plan_range(self, first: int, stop: int) -> List[int]:
+        """Replan the replannable days in [first, stop), in runs between fixed days"""
+        constraints = self._constraints()
+        ranking = [p.as_scored() for p in self.protocols]
+        scheduler = WeeklyScheduler(self.config)
+        usage = self._usage_before(first, constraints)
+        replanned = []
+
+        offset = first
+        while offset < stop:
+            if not self._replannable(offset):
+                self._apply_usage(usage, offset, self._occurrences(offset), constraints)
+                offset += 1
+                continue
+            run_end = offset
+            while run_end < stop and self._replannable(run_end):
+                run_end += 1
+            names = [WEEKDAYS[(self.start_date + timedelta(days=d)).weekday()] for d in range(offset, run_end)]
+            placements = scheduler.schedule_days(ranking, names, first_day=offset, usage=usage)
+            for day, ranks in zip(range(offset, run_end), placements):
+                self.days[day] = [ranking[rank]["protocol_id"] for rank in ranks]
+                replanned.append(day)
+            offset = run_end
+        return replanned
+
+    def _violates_constraints(self, offset: int, constraints: Dict[str, PlannedProtocol]) -> bool:
+        today = self._occurrences(offset)
+        for protocol_id in set(today):
+            protocol = constraints.get(protocol_id)
+            if protocol is None:
+                continue
+            if today.count(protocol_id) > protocol.max_daily_frequency:
+                return True
+            for previous in range(max(0, offset - protocol.min_rest_period), offset):
+                if protocol_id in self._occurrences(previous):
+                    return True
+        return False
+
+    def _repair_after(self, offset: int) -> List[int]:
+        """Replan following days only while they break a rest period or daily frequency"""
+        constraints = self._constraints()
+        reach = max([p.min_rest_period for p in constraints.values()] + [0])
+        repaired = []
+        day, dirty_until = offset + 1, offset + reach
+        while day <= min(dirty_until, len(self.days) - 1):
+            if self._replannable(day) and self._violates_constraints(day, constraints):
+                repaired += self._plan_range(day, day + 1)
+                dirty_until = max(dirty_until, day + reach)
+            day += 1
+        return repaired
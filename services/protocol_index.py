@@ -0,0 +1,143 @@
+# services/protocol_index.py
+import hashlib
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from models.protocol import Protocol, ProtocolType
+
+# Patient deficit subscale -> protocol feature used for the similarity dot product
+MOTOR_FEATURE_MAP = {
+    "grasp": "grasping",
+    "grip": "pronation_supination",
+    "pinch": "pinching",
+    "gross_movement": "reaching",
+}
+
+COGNITIVE_FEATURE_MAP = {
+    "memory": "memory_wm",
+    "attention": "attention",
+    "language": "semantic_processing",
+    "naming": "memory_semantic",
+    "abstraction": "symbolic_understanding",
+    "visuospatial": "visual_language",
+    "delayed_recall": "daily_living_activity",
+    "orientation": "visualspatial_processing_awareness_neglect",
+}
+
+DIFFICULTY_LEVELS = ("low", "mid", "high")
+PROTOCOL_TYPES = tuple(ProtocolType)
+
+class ProtocolFeatureIndex:
+    """Immutable, array-backed view of a protocol catalog shared by scoring, filtering and planning"""
+    __slots__ = (
+        "protocols", "protocol_ids", "features", "difficulty", "type_codes",
+        "contraindications", "version", "_positions",
+    )
+
+    def __init__(self, protocols: List[Protocol]):
+        set_ = object.__setattr__
+        set_(self, "protocols", tuple(protocols))
+        set_(self, "protocol_ids", tuple(p.protocol_id for p in protocols))
+        set_(self, "_positions", {pid: i for i, pid in enumerate(self.protocol_ids)})
+
+        # features x protocols, motor columns first (same order as the feature maps)
+        set_(self, "features", _readonly(protocol_feature_matrix(protocols)))
+        # protocols x (motor, cognitive) difficulty codes, indexing DIFFICULTY_LEVELS
+        set_(self, "difficulty", _readonly(np.array(
+            [[DIFFICULTY_LEVELS.index(p.difficulty_motor), DIFFICULTY_LEVELS.index(p.difficulty_cognitive)]
+             for p in protocols],
+            dtype=np.int8,
+        ).reshape(len(protocols), 2)))
+        # Codes indexing PROTOCOL_TYPES
+        set_(self, "type_codes", _readonly(np.array(
+            [PROTOCOL_TYPES.index(p.type) for p in protocols], dtype=np.int8
+        )))
+        set_(self, "contraindications", ContraindicationIndex(
+            [p.safety_constraints.contraindications for p in protocols]
+        ))
+        set_(self, "version", catalog_version(protocols))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ProtocolFeatureIndex is immutable; build a new index for a new catalog")
+
+    def __reduce__(self):
+        # Rebuild from the protocols on unpickling (e.g. in worker processes)
+        return (ProtocolFeatureIndex, (list(self.protocols),))
+
+    def __len__(self) -> int:
+        return len(self.protocol_ids)
+
+    def position(self, protocol_id: str) -> int:
+        """Column of a protocol in the index arrays"""
+        try:
+            return self._positions[protocol_id]
+        except KeyError:
+            raise ValueError(f"Protocol {protocol_id} not found") from None
+
+    def payload(self, position: int) -> Dict:
+        """Serialized protocol (`protocol.model_dump()`), built afresh so the caller may change any of it"""
+        return self.protocols[position].model_dump()
+
+    def type_mask(self, protocol_type: ProtocolType) -> np.ndarray:
+        """Boolean mask of protocols with the given type"""
+        return self.type_codes == PROTOCOL_TYPES.index(protocol_type)
+
+class ContraindicationIndex:
+    """Boolean tag x protocol matrix; filtering a tag set is an OR over its rows"""
+    def __init__(self, contraindications: List[Iterable[str]]):
+        vocabulary = sorted({tag for tags in contraindications for tag in tags})
+        self.tags = {tag: row for row, tag in enumerate(vocabulary)}
+        self.matrix = np.zeros((len(vocabulary), len(contraindications)), dtype=bool)
+        for column, tags in enumerate(contraindications):
+            for tag in tags:
+                self.matrix[self.tags[tag], column] = True
+        self.matrix.setflags(write=False)
+
+    def blocked_mask(self, tags: Optional[Iterable[str]]) -> np.ndarray:
+        """Protocols contraindicated by any of the tags"""
+        rows = [self.tags[tag] for tag in set(tags or []) if tag in self.tags]
+        if not rows:
+            return np.zeros(self.matrix.shape[1], dtype=bool)
+        return np.logical_or.reduce(self.matrix[rows], axis=0)
+
+    def allowed_mask(self, tags: Optional[Iterable[str]]) -> np.ndarray:
+        """Protocols not contraindicated by any of the tags"""
+        return ~self.blocked_mask(tags)
+
+    def allowed_matrix(self, tag_lists: List[Optional[Iterable[str]]]) -> np.ndarray:
+        """
+        Allowed masks for many tag sets at once.
+
+        Returns:
+            np.ndarray: tag_sets x protocols boolean matrix, computed as a single
+            boolean product of the tag incidence matrix with the contraindication matrix.
+        """
+        incidence = np.zeros((len(tag_lists), len(self.tags)), dtype=bool)
+        for row, tags in enumerate(tag_lists):
+            for tag in tags or []:
+                column = self.tags.get(tag)
+                if column is not None:
+                    incidence[row, column] = True
+        return ~(incidence @ self.matrix)
+
+def catalog_version(protocols: List[Protocol]) -> str:
+    """Content hash of the catalog; changes whenever any protocol (or their order) changes"""
+    digest = hashlib.sha256()
+    for protocol in protocols:
+        digest.update(protocol.model_dump_json().encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+def protocol_feature_matrix(protocols: List[Protocol]) -> np.ndarray:
+    """Stack protocol motor/cognitive features into a features x protocols matrix"""
+    columns = []
+    for protocol in protocols:
+        columns.append(
+            [getattr(protocol.motor_features, attr) for attr in MOTOR_FEATURE_MAP.values()]
+            + [getattr(protocol.cognitive_features, attr) for attr in COGNITIVE_FEATURE_MAP.values()]
+        )
+    n_features = len(MOTOR_FEATURE_MAP) + len(COGNITIVE_FEATURE_MAP)
+    return np.array(columns, dtype=np.float64).reshape(len(protocols), n_features).T
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
@@ -0,0 +1,161 @@
+# services/query_stats.py
+"""
+Per-unit-of-work SQL instrumentation.
+
+    instrument(get_engine())            # once per engine
+    with track_queries("patient_page") as stats:
+        ...                             # any repository calls
+    stats.summary()                     # counts, latency, rows, N+1 suspects
+
+Recording is scoped with a context variable, so concurrent Streamlit sessions
+(threads) and asyncio tasks each see only their own queries.
+"""
+import hashlib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))*\s*\)")
+_POSTCOMPILE = re.compile(r"\(?\s*__\[POSTCOMPILE_\w+\]\s*\)?")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_statement(statement: str) -> str:
+    """Statement shape: literals and parameter lists replaced by ?, whitespace collapsed"""
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _POSTCOMPILE.sub("(?)", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+def statement_fingerprint(statement: str) -> str:
+    return hashlib.sha1(normalize_statement(statement).encode()).hexdigest()[:12]
+
+class StatementStats(BaseModel):
+    """Aggregate of every execution of one statement shape"""
+    fingerprint: str
+    statement: str = Field(description="Normalized statement")
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: Optional[int] = Field(default=None, description="Sum of reported row counts, None if the driver reports none")
+
+class QueryStats:
+    """Queries recorded during one unit of work (a page render, a request, a job batch)"""
+    def __init__(self, name: str, n_plus_one_threshold: int = 5):
+        self.name = name
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.statements: Dict[str, StatementStats] = {}
+        self.queries = 0
+        self.total_ms = 0.0
+        self.started = time.perf_counter()
+        self.elapsed_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration_ms: float, rows: Optional[int]):
+        fingerprint = statement_fingerprint(statement)
+        with self._lock:
+            stats = self.statements.get(fingerprint)
+            if stats is None:
+                stats = self.statements[fingerprint] = StatementStats(
+                    fingerprint=fingerprint, statement=normalize_statement(statement)
+                )
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            if rows is not None:
+                stats.rows = (stats.rows or 0) + rows
+            self.queries += 1
+            self.total_ms += duration_ms
+
+    def suspected_n_plus_one(self) -> List[StatementStats]:
+        """Statement shapes repeated at least n_plus_one_threshold times, most frequent first"""
+        repeated = [s for s in self.statements.values() if s.count >= self.n_plus_one_threshold]
+        return sorted(repeated, key=lambda s: s.count, reverse=True)
+
+    def summary(self, top: int = 10) -> Dict[str, object]:
+        """JSON-ready report: totals, the slowest statement shapes and N+1 suspects"""
+        slowest = sorted(self.statements.values(), key=lambda s: s.total_ms, reverse=True)[:top]
+        return {
+            "name": self.name,
+            "queries": self.queries,
+            "distinct_statements": len(self.statements),
+            "query_ms": round(self.total_ms, 3),
+            "elapsed_ms": round(self.elapsed_ms, 3) if self.elapsed_ms is not None else None,
+            "slowest": [s.model_dump() for s in slowest],
+            "suspected_n_plus_one": [s.model_dump() for s in self.suspected_n_plus_one()],
+        }
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_instrumented: Dict[int, Engine] = {}
+_instrumented_lock = threading.Lock()
+
+def instrument(engine: Engine) -> Engine:
+    """Hook the engine's cursor events (idempotent). Recording only happens inside track_queries()."""
+    with _instrumented_lock:
+        if id(engine) not in _instrumented:
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(engine, "handle_error", _handle_error)
+            _instrumented[id(engine)] = engine
+    return engine
+
+def uninstrument(engine: Engine):
+    with _instrumented_lock:
+        if _instrumented.pop(id(engine), None) is not None:
+            event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+            event.remove(engine, "handle_error", _handle_error)
+
+@contextmanager
+def track_queries(name: str, n_plus_one_threshold: int = 5,
+                  on_finish: Optional[Callable[[QueryStats], None]] = None) -> Iterator[QueryStats]:
+    """
+    Record every query run by this thread/task on an instrumented engine.
+
+    Nested blocks record into the innermost one only.
+
+    Args:
+        name (str): Label of the unit of work (page, request, job batch).
+        n_plus_one_threshold (int): Repetitions of one statement shape that flag it as N+1.
+        on_finish (Optional[Callable[[QueryStats], None]]): Called with the stats on exit, e.g. to log them.
+    """
+    stats = QueryStats(name, n_plus_one_threshold)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        stats.elapsed_ms = (time.perf_counter() - stats.started) * 1000
+        if on_finish:
+            on_finish(stats)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    starts = conn.info.get("query_stats_start")
+    if stats is None or not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    # DB-API rowcount is -1 when unknown (e.g. SQLite SELECTs); buffered MySQL cursors report fetched rows
+    rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    stats.record(statement, duration_ms, rows)
+
+def _handle_error(context):
+    # A failing statement never reaches after_cursor_execute: drop the start time it pushed
+    if _current.get() is None or context.execution_context is None or context.connection is None:
+        return
+    starts = context.connection.info.get("query_stats_start")
+    if starts:
+        starts.pop()
@@ -0,0 +1,117 @@
+# services/score_cache.py
+import hashlib
+import json
+import pickle
+import threading
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+from models.patient import Patient
+from services.protocol_index import ProtocolFeatureIndex
+from services.scoring import ProtocolScorer
+from utils.cache import LRUCache
+
+ScoreKey = Tuple[Hashable, ...]
+
+def patient_fingerprint(patient: Patient) -> str:
+    """Stable hash of everything scoring depends on: clinical scores and tags"""
+    payload = {
+        "clinical_scores": patient.clinical_scores.model_dump(),
+        "tags": sorted(patient.tags or []),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+class ScoreCache:
+    """
+    Memoizes ranked protocol lists per (patient fingerprint, weights, catalog version).
+
+    A patient whose ARAT/MoCA or tags change gets a new fingerprint; the first
+    lookup with it drops that patient's stale entries and leaves everyone else's alone.
+    The patient's `ProtocolScorer` is cached alongside the rankings, so a change of
+    weights alone re-ranks from its similarity vectors instead of rescoring.
+    Rankings are cached pickled, so every lookup hands out its own copy.
+    """
+    def __init__(self, maxsize: int = 256):
+        self._lock = threading.RLock()
+        self._keys_by_patient: Dict[str, Set[ScoreKey]] = defaultdict(set)
+        self._fingerprints: Dict[str, str] = {}
+        self._cache = LRUCache(maxsize=maxsize, on_evict=self._forget_key)
+
+    def get_or_score(self, patient: Patient, index: ProtocolFeatureIndex, motor_weight: float,
+                     cognitive_weight: float, k: Optional[int] = None) -> List[Dict]:
+        """
+        Ranked protocols for the patient, computed at most once per key.
+
+        Args:
+            patient (Patient): Patient to score.
+            index (ProtocolFeatureIndex): Protocol catalog; its version is part of the key.
+            motor_weight (float): Weight applied to the motor similarity.
+            cognitive_weight (float): Weight applied to the cognitive similarity.
+            k (Optional[int]): Return `top_k(k)` instead of the full explained ranking.
+
+        Returns:
+            List[Dict]: Same result as `ProtocolScorer.score_all_protocols` (or `top_k`).
+        """
+        fingerprint = patient_fingerprint(patient)
+        key = ("scores", patient.patient_id, fingerprint, motor_weight, cognitive_weight, index.version, k)
+        with self._lock:
+            if self._fingerprints.get(patient.patient_id) != fingerprint:
+                self.invalidate_patient(patient.patient_id)
+                self._fingerprints[patient.patient_id] = fingerprint
+            cached = self._cache.get(key)
+            if cached is not None:
+                return pickle.loads(cached)
+
+        scorer = self.get_scorer(patient, index, fingerprint)
+        if k is None:
+            scored = scorer.score_all_protocols(motor_weight, cognitive_weight)
+        else:
+            scored = scorer.top_k(k, motor_weight, cognitive_weight)
+
+        with self._lock:
+            # Another thread may have changed this patient's fingerprint meanwhile
+            if self._fingerprints.get(patient.patient_id) == fingerprint:
+                self._put(patient.patient_id, key, pickle.dumps(scored, pickle.HIGHEST_PROTOCOL))
+        return scored
+
+    def get_scorer(self, patient: Patient, index: ProtocolFeatureIndex,
+                   fingerprint: Optional[str] = None) -> ProtocolScorer:
+        """Cached scorer (and its similarity vectors) for the patient's current fingerprint"""
+        fingerprint = fingerprint or patient_fingerprint(patient)
+        key = ("scorer", patient.patient_id, fingerprint, index.version)
+        with self._lock:
+            scorer = self._cache.get(key)
+        if scorer is None:
+            scorer = ProtocolScorer(patient, index)
+            with self._lock:
+                if self._fingerprints.get(patient.patient_id, fingerprint) == fingerprint:
+                    self._put(patient.patient_id, key, scorer)
+        return scorer
+
+    def invalidate_patient(self, patient_id: str):
+        """Drop every cached ranking and scorer of one patient"""
+        with self._lock:
+            for key in self._keys_by_patient.pop(patient_id, set()):
+                self._cache.pop(key)
+            self._fingerprints.pop(patient_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._keys_by_patient.clear()
+            self._fingerprints.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+    def _put(self, patient_id: str, key: ScoreKey, value):
+        self._cache.put(key, value)
+        if key in self._cache:
+            self._keys_by_patient[patient_id].add(key)
+
+    def _forget_key(self, key: ScoreKey, value):
+        # key[1] is always the patient_id
+        keys = self._keys_by_patient.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_patient[key[1]]
@@ -1,134 +1,287 @@
-# Patient Clinical Subscales
-# - ARAT: GRASP, GRIP, PINCH, GROSS_MOVEMENT (higher scores = better function)
-# - MoCA: VISUOSPATIAL, MEMORY, ATTENTION, LANGUAGE (higher scores = better cognition)
-
-# Protocol Features
-# - Motor: GRASPING, PINCHING, REACHING (0 or 1)
-# - Cognitive: VISUALSPATIAL_PROCESSING, MEMORY_WM, ATTENTION, LANGUAGE (0 or 1)
-
-# Scoring Logic
-# @ PPF
-# @ DM + Performance
-# @
-
-from models.patient import Patient
-from models.protocol import Protocol
-from typing import Callable, Tuple, Dict, List, Optional, Any
-
-class ProtocolScorer:
-    def __init__(self, patient: Patient, protocols: List[Protocol]):
-        self.patient = patient
-        self.protocols = filter_protocols(protocols, patient)
-
-    def score_all_protocols(self, motor_weight: float, cognitive_weight: float) -> List[Dict]:
-        """Score all protocols for the patient"""
-        scored_protocols = []
-        for protocol in self.protocols:
-            # Compute motor similarity and contributions
-            motor_similarity, motor_contributions = self._calculate_motor_similarity(protocol)
-            motor_score = motor_similarity * motor_weight
-
-            # Compute cognitive similarity and contributions
-            cognitive_similarity, cognitive_contributions = self._calculate_cognitive_similarity(protocol)
-            cognitive_score = cognitive_similarity * cognitive_weight
-
-            # Total score
-            total_score = motor_score + cognitive_score
-
-            # Store results
-            scored_protocols.append({
-                **protocol.dict(),
-                "score": total_score,
-                "motor_contributions": motor_contributions,
-                "cognitive_contributions": cognitive_contributions
-            })
-
-        # Sort by score (descending)
-        return sorted(scored_protocols, key=lambda x: x["score"], reverse=True)
-
-    def _calculate_motor_similarity(self, protocol: Protocol) -> Tuple[float, Dict]:
-        """Calculate motor similarity and feature contributions using dot product"""
-        arat_deficit = self.patient.clinical_scores.ARAT.deficit()
-        motor_features = protocol.motor_features
-
-        # Combine ARAT deficits and motor features into a single dictionary
-        patient_motor_scores = {
-            "grasp": arat_deficit["grasp"],
-            "grip": arat_deficit["grip"],
-            "pinch": arat_deficit["pinch"],
-            "gross_movement": arat_deficit["gross_movement"]
-        }
-
-        # Protocol motor features (assuming protocol has a similar structure)
-        protocol_motor_features = {
-            "grasp": motor_features.grasping,
-            "grip": motor_features.pronation_supination,
-            "pinch": motor_features.pinching,
-            "gross_movement": motor_features.reaching,
-        }
-
-        # Compute dot product (similarity) and feature contributions
-        similarity = 0
-        contributions = {}
-        for feature in patient_motor_scores:
-            patient_value = patient_motor_scores[feature]
-            protocol_value = protocol_motor_features[feature]
-            feature_contribution = patient_value * protocol_value
-            similarity += feature_contribution
-            contributions[feature] = feature_contribution
-
-        return similarity, contributions
-
-    def _calculate_cognitive_similarity(self, protocol: Protocol) -> Tuple[float, Dict]:
-        """Calculate cognitive similarity and feature contributions using dot product"""
-        moca_deficit = self.patient.clinical_scores.MoCA.deficit()
-        cognitive_features = protocol.cognitive_features
-
-        # Combine MoCA deficits and cognitive features into a single dictionary
-        patient_cognitive_scores = {
-            "memory": moca_deficit["memory"],
-            "attention": moca_deficit["attention"],
-            "language": moca_deficit["language"],
-            "naming": moca_deficit["naming"],
-            "abstraction": moca_deficit["abstraction"],
-            "visuospatial": moca_deficit["visuospatial"],
-            "delayed_recall": moca_deficit["delayed_recall"],
-            "orientation": moca_deficit["orientation"]
-        }
-
-        # Protocol cognitive features (assuming protocol has a similar structure)
-        protocol_cognitive_features = {
-            "memory": cognitive_features.memory_wm,
-            "attention": cognitive_features.attention,
-            "language": cognitive_features.semantic_processing,
-            "naming": cognitive_features.memory_semantic,
-            "abstraction": cognitive_features.symbolic_understanding,
-            "visuospatial": cognitive_features.visual_language,
-            "delayed_recall": cognitive_features.daily_living_activity,
-            "orientation": cognitive_features.visualspatial_processing_awareness_neglect
-        }
-
-        # Compute dot product (similarity) and feature contributions
-        similarity = 0
-        contributions = {}
-        for feature in patient_cognitive_scores:
-            patient_value = patient_cognitive_scores[feature]
-            protocol_value = protocol_cognitive_features[feature]
-            feature_contribution = patient_value * protocol_value
-            similarity += feature_contribution
-            contributions[feature] = feature_contribution
-
-        return similarity, contributions
-
-def filter_protocols(protocols: List[Protocol], patient: Patient) -> List[Protocol]:
-    """Filter protocols based on patient tags and contraindications."""
-    filtered_protocols = []
-    for protocol in protocols:
-        # Check if any contraindication matches a patient tag
-        contraindicated = any(
-            tag in protocol.safety_constraints.contraindications
-            for tag in patient.tags
-        )
-        if not contraindicated:
-            filtered_protocols.append(protocol)
-    return filtered_protocols
\ No newline at end of file
+# Patient Clinical Subscales
+# - ARAT: GRASP, GRIP, PINCH, GROSS_MOVEMENT (higher scores = better function)
+# - MoCA: VISUOSPATIAL, MEMORY, ATTENTION, LANGUAGE (higher scores = better cognition)
+
+# Protocol Features
+# - Motor: GRASPING, PINCHING, REACHING (0 or 1)
+# - Cognitive: VISUALSPATIAL_PROCESSING, MEMORY_WM, ATTENTION, LANGUAGE (0 or 1)
+
+# Scoring Logic
+# @ PPF
+# @ DM + Performance
+# @
+
+from models.patient import Patient
+from models.protocol import Protocol
+from services.protocol_index import ProtocolFeatureIndex, MOTOR_FEATURE_MAP, COGNITIVE_FEATURE_MAP
+from typing import Callable, Tuple, Dict, List, Optional, Any, Union, Sequence
+from collections import Counter
+from pydantic import BaseModel
+import numpy as np
+
+class WeightSweep(BaseModel):
+    """Scores of one patient over a grid of (motor_weight, cognitive_weight) pairs"""
+    weights: List[Tuple[float, float]]
+    protocol_ids: List[str]
+    scores: np.ndarray  # weights x protocols
+    top_k: List[List[str]]  # best-first protocol ids per weight pair
+    change_points: List[int]  # grid positions whose top-k set differs from the previous one
+    stability: float  # share of the grid sharing the most common top-k set
+    top_k_frequency: Dict[str, float]  # share of the grid where each protocol is in the top-k
+
+    class Config:
+        arbitrary_types_allowed = True
+
+class ProtocolScorer:
+    def __init__(self, patient: Patient, protocols: Union[List[Protocol], ProtocolFeatureIndex]):
+        self.patient = patient
+        self.index = as_protocol_index(protocols)
+        self.positions = allowed_positions(self.index, patient)
+        self.protocols = [self.index.protocols[i] for i in self.positions]
+        self.deficits = patient_deficit_matrix([patient])[0]
+
+        # 2 x protocols (motor, cognitive similarity); weights only enter in _scores, so a
+        # weight change re-ranks from these vectors without touching the features again
+        n_motor = len(MOTOR_FEATURE_MAP)
+        features = self.index.features[:, self.positions]
+        self.similarities = np.vstack([
+            self.deficits[:n_motor] @ features[:n_motor],
+            self.deficits[n_motor:] @ features[n_motor:],
+        ])
+
+    def score_all_protocols(self, motor_weight: float, cognitive_weight: float) -> List[Dict]:
+        """Score all protocols for the patient"""
+        return self.top_k(len(self.positions), motor_weight, cognitive_weight, explain=True)
+
+    def top_k(self, k: int, motor_weight: float, cognitive_weight: float, explain: bool = False) -> List[Dict]:
+        """
+        Best k protocols for the patient, highest score first.
+
+        Only the winners are materialized as dicts; the rest of the catalog stays
+        as raw scores.
+
+        Args:
+            k (int): Number of protocols to return.
+            motor_weight (float): Weight applied to the motor similarity.
+            cognitive_weight (float): Weight applied to the cognitive similarity.
+            explain (bool): Also attach per-feature motor/cognitive contributions.
+
+        Returns:
+            List[Dict]: Protocol payloads with their score, in the same order as
+            the first k entries of `score_all_protocols`.
+        """
+        scores = self._scores(motor_weight, cognitive_weight)
+        winners = select_top_k(scores, k)
+
+        n_motor = len(MOTOR_FEATURE_MAP)
+        if explain:
+            contributions = self.deficits[:, None] * self.index.features[:, self.positions[winners]]
+
+        results = []
+        for rank, column in enumerate(winners):
+            result = self.index.payload(self.positions[column])
+            result["score"] = float(scores[column])
+            if explain:
+                result["motor_contributions"] = dict(zip(MOTOR_FEATURE_MAP, contributions[:n_motor, rank].tolist()))
+                result["cognitive_contributions"] = dict(zip(COGNITIVE_FEATURE_MAP, contributions[n_motor:, rank].tolist()))
+            results.append(result)
+        return results
+
+    def sweep_weights(self, weights: Sequence[Tuple[float, float]], k: int = 5) -> WeightSweep:
+        """
+        Score the patient at every weight pair in one product and summarize rank stability.
+
+        Args:
+            weights (Sequence[Tuple[float, float]]): (motor_weight, cognitive_weight) pairs,
+                e.g. from `weight_grid`. Change points follow this order.
+            k (int): Size of the top-k set tracked for stability.
+
+        Returns:
+            WeightSweep: weights x protocols score matrix plus top-k summaries.
+        """
+        grid = np.asarray(weights, dtype=np.float64).reshape(-1, 2)
+        scores = grid @ self.similarities
+        protocol_ids = [self.index.protocol_ids[i] for i in self.positions]
+
+        # Stable sort per row, so ties rank exactly as in score_all_protocols
+        ranked = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        top_k = [[protocol_ids[column] for column in row] for row in ranked]
+        top_k_sets = [frozenset(row) for row in top_k]
+
+        change_points = [i for i in range(1, len(top_k_sets)) if top_k_sets[i] != top_k_sets[i - 1]]
+        most_common = Counter(top_k_sets).most_common(1)
+        stability = most_common[0][1] / len(top_k_sets) if most_common else 0.0
+        membership = Counter(pid for row in top_k for pid in row)
+
+        return WeightSweep(
+            weights=[tuple(pair) for pair in grid.tolist()],
+            protocol_ids=protocol_ids,
+            scores=scores,
+            top_k=top_k,
+            change_points=change_points,
+            stability=stability,
+            top_k_frequency={pid: count / len(top_k) for pid, count in membership.items()},
+        )
+
+    def _scores(self, motor_weight: float, cognitive_weight: float) -> np.ndarray:
+        """Total score of every allowed protocol, in `self.positions` order"""
+        return np.array([motor_weight, cognitive_weight]) @ self.similarities
+
+    def _calculate_motor_similarity(self, protocol: Protocol) -> Tuple[float, Dict]:
+        """Calculate motor similarity and feature contributions using dot product"""
+        arat_deficit = self.patient.clinical_scores.ARAT.deficit()
+        motor_features = protocol.motor_features
+
+        # Combine ARAT deficits and motor features into a single dictionary
+        patient_motor_scores = {feature: arat_deficit[feature] for feature in MOTOR_FEATURE_MAP}
+
+        # Protocol motor features (assuming protocol has a similar structure)
+        protocol_motor_features = {
+            feature: getattr(motor_features, attr)
+            for feature, attr in MOTOR_FEATURE_MAP.items()
+        }
+
+        # Compute dot product (similarity) and feature contributions
+        similarity = 0
+        contributions = {}
+        for feature in patient_motor_scores:
+            patient_value = patient_motor_scores[feature]
+            protocol_value = protocol_motor_features[feature]
+            feature_contribution = patient_value * protocol_value
+            similarity += feature_contribution
+            contributions[feature] = feature_contribution
+
+        return similarity, contributions
+
+    def _calculate_cognitive_similarity(self, protocol: Protocol) -> Tuple[float, Dict]:
+        """Calculate cognitive similarity and feature contributions using dot product"""
+        moca_deficit = self.patient.clinical_scores.MoCA.deficit()
+        cognitive_features = protocol.cognitive_features
+
+        # Combine MoCA deficits and cognitive features into a single dictionary
+        patient_cognitive_scores = {feature: moca_deficit[feature] for feature in COGNITIVE_FEATURE_MAP}
+
+        # Protocol cognitive features (assuming protocol has a similar structure)
+        protocol_cognitive_features = {
+            feature: getattr(cognitive_features, attr)
+            for feature, attr in COGNITIVE_FEATURE_MAP.items()
+        }
+
+        # Compute dot product (similarity) and feature contributions
+        similarity = 0
+        contributions = {}
+        for feature in patient_cognitive_scores:
+            patient_value = patient_cognitive_scores[feature]
+            protocol_value = protocol_cognitive_features[feature]
+            feature_contribution = patient_value * protocol_value
+            similarity += feature_contribution
+            contributions[feature] = feature_contribution
+
+        return similarity, contributions
+
+class CohortScorer:
+    """Scores a whole cohort against the protocol catalog with a single matrix multiply"""
+    def __init__(self, protocols: Union[List[Protocol], ProtocolFeatureIndex]):
+        self.index = as_protocol_index(protocols)
+
+    def score_matrix(self, patients: List[Patient], motor_weight: float, cognitive_weight: float,
+                     apply_contraindications: bool = False) -> np.ndarray:
+        """
+        Score every patient against every protocol.
+
+        Args:
+            patients (List[Patient]): Patients to score (rows of the result).
+            motor_weight (float): Weight applied to the motor similarity.
+            cognitive_weight (float): Weight applied to the cognitive similarity.
+            apply_contraindications (bool): Set contraindicated entries to -inf.
+
+        Returns:
+            np.ndarray: patients x protocols matrix of total scores, equal to the
+            `score` computed by `ProtocolScorer.score_all_protocols`.
+        """
+        deficits = patient_deficit_matrix(patients)
+        n_motor = len(MOTOR_FEATURE_MAP)
+        # Fold the weights into the deficits so both similarity terms come out of one product
+        deficits[:, :n_motor] *= motor_weight
+        deficits[:, n_motor:] *= cognitive_weight
+        scores = deficits @ self.index.features
+        if apply_contraindications:
+            scores[~self.allowed_matrix(patients)] = -np.inf
+        return scores
+
+    def allowed_matrix(self, patients: List[Patient]) -> np.ndarray:
+        """patients x protocols mask of protocols not contraindicated by the patient's tags"""
+        return self.index.contraindications.allowed_matrix([patient.tags for patient in patients])
+
+    def score_cohort(self, patients: List[Patient], motor_weight: float, cognitive_weight: float) -> Dict[str, List[Dict]]:
+        """Ranked, contraindication-filtered protocols for every patient, keyed by patient_id"""
+        scores = self.score_matrix(patients, motor_weight, cognitive_weight)
+        allowed = self.allowed_matrix(patients)
+
+        results = {}
+        for patient, patient_scores, patient_allowed in zip(patients, scores, allowed):
+            positions = np.flatnonzero(patient_allowed)
+            # Stable descending order keeps ties in catalog order, like score_all_protocols
+            order = positions[np.argsort(-patient_scores[positions], kind="stable")]
+            results[patient.patient_id] = [
+                {**self.index.payload(i), "score": float(patient_scores[i])}
+                for i in order
+            ]
+        return results
+
+def patient_deficit_matrix(patients: List[Patient]) -> np.ndarray:
+    """Stack ARAT and MoCA deficits into a patients x features matrix (motor columns first)"""
+    rows = []
+    for patient in patients:
+        arat_deficit = patient.clinical_scores.ARAT.deficit()
+        moca_deficit = patient.clinical_scores.MoCA.deficit()
+        rows.append(
+            [arat_deficit[feature] for feature in MOTOR_FEATURE_MAP]
+            + [moca_deficit[feature] for feature in COGNITIVE_FEATURE_MAP]
+        )
+    return np.array(rows, dtype=np.float64).reshape(len(patients), len(MOTOR_FEATURE_MAP) + len(COGNITIVE_FEATURE_MAP))
+
+def as_protocol_index(protocols: Union[List[Protocol], ProtocolFeatureIndex]) -> ProtocolFeatureIndex:
+    """Reuse a prebuilt index, or build one for a plain protocol list"""
+    if isinstance(protocols, ProtocolFeatureIndex):
+        return protocols
+    return ProtocolFeatureIndex(protocols)
+
+def allowed_positions(index: ProtocolFeatureIndex, patient: Patient) -> np.ndarray:
+    """Index positions of the protocols not contraindicated for the patient, in catalog order"""
+    return np.flatnonzero(index.contraindications.allowed_mask(patient.tags))
+
+def weight_grid(motor_weights: Sequence[float], cognitive_weights: Sequence[float]) -> np.ndarray:
+    """Cartesian product of weight values as an (n_motor * n_cognitive) x 2 array"""
+    motor, cognitive = np.meshgrid(motor_weights, cognitive_weights, indexing="ij")
+    return np.column_stack([motor.ravel(), cognitive.ravel()])
+
+def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k highest scores, best first, in O(n + k log k).
+
+    Ties are broken by position, so the result is exactly the head of a stable
+    descending sort.
+    """
+    n = len(scores)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+
+    kth_best = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > kth_best)
+    tied = np.flatnonzero(scores == kth_best)[:k - len(above)]
+    winners = np.concatenate([above, tied])
+    return winners[np.argsort(-scores[winners], kind="stable")]
+
+def filter_protocols(protocols: Union[List[Protocol], ProtocolFeatureIndex], patient: Patient) -> List[Protocol]:
+    """Filter protocols based on patient tags and contraindications."""
+    if isinstance(protocols, ProtocolFeatureIndex):
+        return [protocols.protocols[i] for i in allowed_positions(protocols, patient)]
+    # Building an index per call costs far more than one pass over a plain list
+    tags = set(patient.tags or [])
+    return [
+        protocol for protocol in protocols
+        if tags.isdisjoint(protocol.safety_constraints.contraindications)
+    ]
@@ -0,0 +1,92 @@
+# tests/conftest.py
+import json
+import random
+import pytest
+from utils.config import Settings
+from utils.mock_data import generate_random_history, generate_random_patient
+from models.patient import Patient
+from models.protocol import Protocol
+
+@pytest.fixture
+def protocols():
+    return [
+        Protocol(**json.load(open(path)))
+        for path in sorted((Settings.DATA_PATH / "protocols").glob("*.json"))
+    ]
+
+@pytest.fixture
+def patient():
+    with open(Settings.DATA_PATH / "patients" / "P001.json") as f:
+        return Patient(**json.load(f))
+
+@pytest.fixture
+def history_patient(patient):
+    """P001 with 8 weeks of sessions on three protocols"""
+    random.seed(11)
+    patient.prescriptions, patient.sessions = generate_random_history(patient.patient_id, ["PR1", "PR2", "PR3"], weeks=8)
+    return patient
+
+@pytest.fixture
+def history_catalog(protocols):
+    """The protocol catalog plus PR1-PR3, the protocols of history_patient's sessions"""
+    catalog = {p.protocol_id: p for p in protocols}
+    for protocol_id in ("PR1", "PR2", "PR3"):
+        catalog[protocol_id] = protocols[0].model_copy(update={"protocol_id": protocol_id})
+    return catalog
+
+@pytest.fixture
+def cohort():
+    random.seed(7)
+    return [generate_random_patient(f"P{i:03d}") for i in range(20)]
+
+@pytest.fixture
+def sqlite_db(monkeypatch, tmp_path):
+    """SQLite stand-in for the production schema, seeded with two patients"""
+    from datetime import datetime, timedelta
+    from services import data_db
+    from services.data_db import (
+        Patient as DBPatient, Prescription as DBPrescription, PatientSession, SessionRecording,
+        RecordingKey, create_db_and_tables, reset_engine, session_scope,
+    )
+
+    # A file rather than memory, so the sync and async engines see the same data
+    monkeypatch.setattr(Settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'recsys.db'}")
+    monkeypatch.setattr(Settings, "ASYNC_DATABASE_URL", None)
+    reset_engine()
+    create_db_and_tables()
+
+    start = datetime(2024, 2, 19, 10)
+    with session_scope() as session:
+        for patient_id in (1, 2):
+            session.add(DBPatient(
+                patient_id=patient_id, hospital_id=1, patient_user=f"user{patient_id}", paretic_side="LEFT",
+                upper_extremity_to_train="LEFT", hand_raising_capacity="LOW", cognitive_function_level="MEDIUM",
+                has_heminegligence=False, gender="F", skin_color="none", birth_date=datetime(1960, 1, 1),
+                videogame_exp=0, computer_exp=1, comments=None, ptn_height_cm=170, arm_size_cm=60,
+            ))
+            for p in range(2):
+                prescription_id = patient_id * 10 + p
+                session.add(DBPrescription(
+                    prescription_id=prescription_id, patient_id=patient_id, protocol_id=200 + p,
+                    starting_date=start, ending_date=start + timedelta(weeks=2), weekday="MONDAY",
+                    session_duration=300, ar_mode="NONE",
+                ))
+                for s in range(3):
+                    session_id = prescription_id * 10 + s
+                    session.add(PatientSession(
+                        session_id=session_id, prescription_id=prescription_id,
+                        starting_date=start + timedelta(days=4 * s), ending_date=start + timedelta(days=4 * s, minutes=5),
+                        status="CLOSED", platform="RGS", device="TABLET", session_log_parsed=True,
+                    ))
+                    for offset, (key, value) in enumerate([
+                        (RecordingKey.SCORE, 100 * (s + 1)),
+                        (RecordingKey.SESSION_DURATION, 150 * (s + 1)),
+                        (RecordingKey.TOTAL_ERRORS, s),
+                        (RecordingKey.TOTAL_SUCCESS, 10 + s),
+                    ]):
+                        session.add(SessionRecording(
+                            recording_id=session_id * 10 + offset, session_id=session_id,
+                            protocol_id=200 + p, recording_key=key.value, recording_value=value,
+                        ))
+    yield data_db
+    reset_engine()
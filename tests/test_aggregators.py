@@ -0,0 +1,203 @@
+# tests/test_aggregators.py
+import random
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from models.patient import EWMAState, Patient, PatientSessions, ProtocolRegistry, ProtocolSessions, WeeklyPrescription
+from models.session_frame import SessionFrame
+from utils.mock_data import generate_random_history, generate_random_patient
+
+def pandas_ewma(sessions, alpha=0.3):
+    """The former DataFrame implementation of ProtocolSessions.get_ewma_metrics"""
+    sessions = sorted(sessions, key=lambda s: s.timestamp)
+    df = pd.DataFrame({
+        "adherence": [s.adherence for s in sessions],
+        "performance_score": [s.performance_score for s in sessions],
+        "difficulty_modulator": [s.difficulty_modulator for s in sessions],
+    })
+    return {
+        "ewma_adherence": df["adherence"].ewm(alpha=alpha).mean().iloc[-1],
+        "ewma_performance": df["performance_score"].ewm(alpha=alpha).mean().iloc[-1],
+        "ewma_difficulty_modulator_change": df["difficulty_modulator"].diff().fillna(0).ewm(alpha=alpha).mean().iloc[-1],
+    }
+
+def test_incremental_ewma_matches_pandas(history_patient):
+    sessions = list(history_patient.sessions)
+    random.Random(3).shuffle(sessions)  # out-of-order arrival is refolded
+    aggregator = ProtocolSessions(patient_id=history_patient.patient_id)
+    for session in sessions:
+        aggregator.add_sessions([session])
+
+    for protocol_id in ("PR1", "PR2", "PR3"):
+        expected = pandas_ewma([s for s in sessions if s.protocol_id == protocol_id])
+        assert aggregator.protocol_scores[protocol_id] == expected
+        other_alpha = pandas_ewma([s for s in sessions if s.protocol_id == protocol_id], alpha=0.7)
+        assert aggregator.get_ewma_metrics(protocol_id, alpha=0.7) == other_alpha
+    assert aggregator.get_ewma_metrics("PR9") is None
+
+def test_ewma_state_resumes_from_a_dump(history_patient):
+    sessions = sorted((s for s in history_patient.sessions if s.protocol_id == "PR2"), key=lambda s: s.timestamp)
+    head, tail = sessions[:3], sessions[3:]
+
+    first = ProtocolSessions(patient_id=history_patient.patient_id)
+    first.add_sessions(head)
+    persisted = first.model_dump(include={"patient_id", "ewma_states"})
+
+    resumed = ProtocolSessions(**persisted)
+    assert isinstance(resumed.ewma_states["PR2"], EWMAState)
+    resumed.add_sessions(tail)
+    assert resumed.get_ewma_metrics("PR2") == pandas_ewma(sessions)
+
+def test_patient_aggregators_are_memoized_until_history_changes(history_patient):
+    weekly = history_patient.weekly_aggregator
+    protocol = history_patient.protocol_aggregator
+    history_patient.model_dump()
+    assert history_patient.weekly_aggregator is weekly
+    assert history_patient.protocol_aggregator is protocol
+
+    history_patient.sessions.append(history_patient.sessions[0].model_copy(update={"session_id": "extra"}))
+    assert history_patient.protocol_aggregator is not protocol
+    assert history_patient.weekly_aggregator is not weekly
+
+    history_patient.prescriptions = history_patient.prescriptions[:1]
+    assert len(history_patient.weekly_aggregator.weekly_data) == 8
+
+def test_reassigned_history_is_never_mistaken_for_the_freed_list(history_patient):
+    sessions = list(history_patient.sessions)
+    history_patient.sessions = sessions[:]
+    aggregator = history_patient.protocol_aggregator
+    # Free the keyed list without rebuilding, then assign one with the same length and last
+    # item; CPython's list free list usually hands it the freed list's address
+    history_patient.sessions = []
+    history_patient.sessions = sessions[:]
+    assert history_patient.protocol_aggregator is not aggregator
+
+def test_aggregators_can_be_left_out_of_serialization(history_patient, monkeypatch):
+    def fail(self):
+        raise AssertionError("aggregator built")
+
+    dumped = history_patient.model_dump(aggregators=False, exclude={"gaming_profile"})
+    assert not Patient.AGGREGATOR_FIELDS & dumped.keys() and "gaming_profile" not in dumped
+    monkeypatch.setattr(Patient, "_memoized", fail)
+    assert "protocol_aggregator" not in history_patient.model_dump_json(aggregators=False)
+
+def reference_weekly_data(prescriptions, sessions):
+    """Prescriptions per covered week, and each session once in the week it falls in"""
+    weekly_data = {}
+    for prescription in prescriptions:
+        current_date = prescription.start_date
+        while current_date <= prescription.end_date:
+            week_start = current_date - timedelta(days=current_date.weekday())
+            weekly_data.setdefault(week_start, {"prescriptions": [], "sessions": []})
+            weekly_data[week_start]["prescriptions"].append(prescription)
+            current_date += timedelta(weeks=1)
+    for session in sessions:
+        week_start = session.timestamp.date() - timedelta(days=session.timestamp.date().weekday())
+        if week_start in weekly_data:
+            weekly_data[week_start]["sessions"].append(session)
+    return weekly_data
+
+def test_week_buckets_join_each_session_once(history_patient):
+    # Staggered, overlapping prescriptions plus sessions outside every prescribed week
+    prescriptions = [
+        p.model_copy(update={"start_date": p.start_date + timedelta(days=3 * i),
+                             "end_date": p.end_date - timedelta(weeks=i)})
+        for i, p in enumerate(history_patient.prescriptions)
+    ]
+    sessions = history_patient.sessions + [
+        history_patient.sessions[0].model_copy(update={"timestamp": history_patient.sessions[0].timestamp + timedelta(weeks=20)})
+    ]
+    aggregator = WeeklyPrescription(patient_id=history_patient.patient_id)
+    for prescription in prescriptions:
+        aggregator.add_data(prescription, sessions)
+
+    expected = reference_weekly_data(prescriptions, sessions)
+    assert list(aggregator.weekly_data) == list(expected)
+    for week, data in expected.items():
+        assert [s.session_id for s in aggregator.weekly_data[week]["sessions"]] == [s.session_id for s in data["sessions"]]
+        assert aggregator.weekly_data[week]["prescriptions"] == data["prescriptions"]
+    # Linear in the input: never more entries than sessions
+    assert sum(len(data["sessions"]) for data in aggregator.weekly_data.values()) == len(sessions) - 1
+
+    # Sessions appended to the same list reach the weeks already tracked, once
+    sessions.append(sessions[-2].model_copy(update={"session_id": "appended"}))
+    aggregator.add_data(prescriptions[0], sessions)
+    expected = reference_weekly_data(prescriptions + [prescriptions[0]], sessions)
+    for week, data in expected.items():
+        assert [s.session_id for s in aggregator.weekly_data[week]["sessions"]] == [s.session_id for s in data["sessions"]]
+
+def test_registry_update_matches_per_protocol_filtering(protocols):
+    random.seed(5)
+    protocol_ids = [p.protocol_id for p in protocols]
+    patients = [generate_random_patient(f"P{i:03d}") for i in range(6)]
+    for patient in patients[:5]:
+        patient.prescriptions, patient.sessions = generate_random_history(
+            patient.patient_id, random.sample(protocol_ids, 3), weeks=6)
+
+    registry = ProtocolRegistry(protocols={p.protocol_id: p for p in protocols})
+    registry.update_aggregators(patients)
+    registry.update_aggregators(patients)  # repeated refreshes do not accumulate
+    for protocol_id in protocol_ids:
+        reference = PatientSessions(protocol_id=protocol_id)
+        for patient in patients:
+            if patient.sessions:
+                reference.add_patient_sessions(patient.patient_id, patient.sessions)
+        aggregator = registry.patient_aggregators[protocol_id]
+        assert aggregator.average_performance == pytest.approx(reference.average_performance)
+        assert aggregator.average_adherence == pytest.approx(reference.average_adherence)
+        for patient_id, stats in aggregator.patient_stats.items():
+            assert stats["num_sessions"] == reference.patient_stats[patient_id]["num_sessions"] > 0
+            assert stats["total_duration"] == pytest.approx(reference.patient_stats[patient_id]["total_duration"])
+
+def test_incremental_registry_update_folds_only_new_sessions(history_catalog, history_patient):
+    sessions = sorted(history_patient.sessions, key=lambda s: s.timestamp)
+    full = ProtocolRegistry(protocols=history_catalog)
+    full.update_aggregators([history_patient])
+
+    incremental = ProtocolRegistry(protocols=history_catalog)
+    history_patient.sessions = sessions[:10]
+    incremental.update_aggregators([history_patient], incremental=True)
+    history_patient.sessions = sessions
+    incremental.update_aggregators([history_patient], incremental=True)
+    incremental.update_aggregators([history_patient], incremental=True)
+
+    for protocol_id in ("PR1", "PR2", "PR3"):
+        expected = full.patient_aggregators[protocol_id]
+        actual = incremental.patient_aggregators[protocol_id]
+        assert actual.patient_stats[history_patient.patient_id]["num_sessions"] == \
+            expected.patient_stats[history_patient.patient_id]["num_sessions"]
+        assert actual.average_performance == pytest.approx(expected.average_performance)
+
+def test_full_registry_update_drops_patients_whose_sessions_were_cleared(history_catalog, history_patient):
+    registry = ProtocolRegistry(protocols=history_catalog)
+    registry.update_aggregators([history_patient])
+    assert history_patient.patient_id in registry.patient_aggregators["PR1"].patient_stats
+
+    history_patient.sessions = []
+    registry.update_aggregators([history_patient])
+    assert all(history_patient.patient_id not in aggregator.patient_stats
+               for aggregator in registry.patient_aggregators.values())
+
+def test_incremental_registry_update_converts_only_appended_sessions(history_catalog, history_patient, monkeypatch):
+    sessions = sorted(history_patient.sessions, key=lambda s: s.timestamp)
+    history_patient.sessions = sessions[:-3]
+    registry = ProtocolRegistry(protocols=history_catalog)
+    registry.update_aggregators([history_patient], incremental=True)
+
+    converted = []
+    from_sessions = SessionFrame.from_sessions.__func__
+    monkeypatch.setattr(SessionFrame, "from_sessions",
+                        classmethod(lambda cls, items: converted.append(len(items)) or from_sessions(cls, items)))
+    history_patient.sessions.extend(sessions[-3:])
+    registry.update_aggregators([history_patient], incremental=True)
+    assert converted == [3]
+
+    full = ProtocolRegistry(protocols=history_catalog)
+    full.update_aggregators([history_patient])
+    for protocol_id in ("PR1", "PR2", "PR3"):
+        actual = registry.patient_aggregators[protocol_id].patient_stats[history_patient.patient_id]
+        expected = full.patient_aggregators[protocol_id].patient_stats[history_patient.patient_id]
+        assert actual["num_sessions"] == expected["num_sessions"]
+        assert actual["total_performance"] == pytest.approx(expected["total_performance"])
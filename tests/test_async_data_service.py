@@ -0,0 +1,74 @@
+# tests/test_async_data_service.py
+import asyncio
+
+from services.async_data_service import AsyncPatientRepository
+from services.data_db import async_database_url, async_session_scope
+from services.data_service import PatientRepository
+
+def test_async_database_url():
+    assert async_database_url("mysql+pymysql://u:p@host/db") == "mysql+aiomysql://u:p@host/db"
+    assert async_database_url("sqlite:///local.db") == "sqlite+aiosqlite:///local.db"
+
+def test_async_repository_matches_sync_repository(sqlite_db):
+    async def fetch():
+        repository = AsyncPatientRepository()
+        return (
+            await repository.get_all_patient_ids(),
+            await repository.get_session_metrics("2"),
+            await repository.get_weekly_usage("1"),
+            await repository.get_patient("1", lazy_load=False),
+        )
+
+    ids, metrics, weekly, patient = asyncio.run(fetch())
+    sync = PatientRepository()
+    assert ids == sync.get_all_patient_ids()
+    assert metrics == sync.get_session_metrics("2")
+    assert weekly == sync.get_weekly_usage("1")
+    assert patient.prescriptions[0].sessions[0].score == 100
+
+def test_gather_histories_keeps_order_and_keys(sqlite_db):
+    async def fetch():
+        repository = AsyncPatientRepository(concurrency=2)
+        return await repository.gather_patients(["2", "1"]), await repository.gather_histories(["1", "2"])
+
+    patients, histories = asyncio.run(fetch())
+    assert [p.patient_id for p in patients] == [2, 1]
+    assert list(histories) == ["1", "2"]
+    assert histories["2"].patient.patient_user == "user2"
+    assert len(histories["2"].session_metrics) == 6
+    assert [u.prescription_id for u in histories["2"].prescription_usage] == [20, 21]
+
+def test_caller_session_runs_serially(sqlite_db):
+    async def fetch():
+        async with async_session_scope() as session:
+            repository = AsyncPatientRepository(session)
+            batches = [batch async for batch in repository.iter_all_patients(batch_size=1)]
+            history = await repository.get_patient_history("1")
+        return batches, history
+
+    batches, history = asyncio.run(fetch())
+    assert [[p.patient_id for p in batch] for batch in batches] == [[1], [2]]
+    assert len(history.session_metrics) == 6
+
+def test_nested_gathers_never_exceed_concurrency(sqlite_db, monkeypatch):
+    from contextlib import asynccontextmanager
+    from services import async_data_service
+
+    open_sessions, peak = 0, 0
+
+    @asynccontextmanager
+    async def counting_scope():
+        nonlocal open_sessions, peak
+        open_sessions += 1
+        peak = max(peak, open_sessions)
+        try:
+            async with async_session_scope() as session:
+                await asyncio.sleep(0.01)  # let the other tasks pile up
+                yield session
+        finally:
+            open_sessions -= 1
+
+    monkeypatch.setattr(async_data_service, "async_session_scope", counting_scope)
+    histories = asyncio.run(AsyncPatientRepository(concurrency=2).gather_histories(["1", "2", "1", "2"]))
+    assert len(histories["1"].session_metrics) == 6
+    assert peak == 2
@@ -0,0 +1,11 @@
+# tests/test_benchmarks.py
+from benchmarks.run_benchmarks import build_cohort, compare, run_benchmarks
+
+def test_benchmark_run_and_baseline_comparison():
+    patients, protocols = build_cohort(n_patients=6, n_protocols=12, n_history=3, history_weeks=2)
+    results = run_benchmarks(patients, protocols, sample=3, repeat=1)
+    assert {"score_all_protocols", "cohort_score_matrix", "generate_weekly_plan", "registry_update"} <= set(results)
+    assert compare(results, results, tolerance=0.0) == []
+
+    slower = {case: {**metrics, "p50_ms": metrics["p50_ms"] * 2} for case, metrics in results.items()}
+    assert compare(slower, results, tolerance=0.2)
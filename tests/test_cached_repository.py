@@ -0,0 +1,114 @@
+# tests/test_cached_repository.py
+from datetime import datetime
+
+from services.cached_repository import CachedPatientRepository
+from services.data_db import PatientSession, SessionRecording, session_scope
+from utils.cache import LRUCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_lru_entries_expire_after_their_ttl():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=4, ttl=10, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=30)
+    clock.now = 15
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["expirations"] == 1
+
+def test_repeated_reads_hit_the_cache(sqlite_db):
+    repository = CachedPatientRepository()
+    first = repository.get_patient("1")
+    assert repository.get_patient(1) is first
+    assert repository.get_session_metrics("1") is repository.get_session_metrics("1")
+    stats = repository.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+
+def test_per_entity_ttl(sqlite_db):
+    clock = FakeClock()
+    repository = CachedPatientRepository(ttls={"patient": 100, "session_metrics": 10}, clock=clock)
+    patient = repository.get_patient("1")
+    metrics = repository.get_session_metrics("1")
+    clock.now = 50
+    assert repository.get_patient("1") is patient
+    assert repository.get_session_metrics("1") is not metrics
+
+def test_committed_writes_invalidate_only_the_touched_patient(sqlite_db):
+    repository = CachedPatientRepository()
+    repository.listen()
+    try:
+        before = repository.get_session_metrics("1")
+        other = repository.get_session_metrics("2")
+
+        with session_scope() as session:
+            session.add(PatientSession(
+                session_id=999, prescription_id=10, starting_date=datetime(2024, 3, 1),
+                ending_date=datetime(2024, 3, 1, 0, 5), status="CLOSED", platform="RGS", device="TABLET",
+                session_log_parsed=True,
+            ))
+            session.add(SessionRecording(recording_id=9990, session_id=999, protocol_id=200,
+                                         recording_key="score", recording_value=1))
+
+        after = repository.get_session_metrics("1")
+        assert len(after) == len(before) + 1
+        assert repository.get_session_metrics("2") is other
+
+        try:
+            with session_scope() as session:
+                session.get(PatientSession, 200).status = "OPEN"
+                session.flush()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        assert repository.get_session_metrics("2") is other
+    finally:
+        repository.stop_listening()
+
+def test_explicit_invalidation(sqlite_db):
+    repository = CachedPatientRepository()
+    patient = repository.get_patient("2")
+    repository.invalidate_patient("2")
+    assert repository.get_patient("2") is not patient
+    assert repository.stats()["invalidations"] == 1
+
+class StubRepository:
+    def get_patient(self, patient_id):
+        return {"patient_id": patient_id}
+
+def test_expiring_read_and_invalidation_do_not_deadlock():
+    import threading
+
+    clock = FakeClock()
+    repository = CachedPatientRepository(StubRepository(), ttls={"patient": 10}, clock=clock)
+    repository.get_patient("1")
+    clock.now = 20
+
+    # Hold the reader inside the expiry callback until the invalidating thread is running
+    forget_key = repository._cache.on_evict
+    evicting, invalidating = threading.Event(), threading.Event()
+
+    def slow_forget_key(key, value):
+        evicting.set()
+        invalidating.wait(timeout=1)
+        forget_key(key, value)
+
+    repository._cache.on_evict = slow_forget_key
+
+    def invalidate():
+        evicting.wait(timeout=1)
+        invalidating.set()
+        repository.invalidate_patient("1")
+
+    threads = [threading.Thread(target=repository.get_patient, args=("1",), daemon=True),
+               threading.Thread(target=invalidate, daemon=True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert not any(thread.is_alive() for thread in threads)
@@ -0,0 +1,41 @@
+# tests/test_cohort_job.py
+import csv
+import json
+import pytest
+from services.cohort_job import run_cohort_job, CHECKPOINT_FILE
+from services.planning import generate_weekly_plan
+from services.scoring import ProtocolScorer
+
+def read_rows(output_dir):
+    rows = []
+    for path in sorted(output_dir.glob("shard-*.csv")):
+        with open(path, newline="") as f:
+            rows.extend(csv.DictReader(f))
+    return rows
+
+def test_cohort_job_writes_every_patient_plan(tmp_path, protocols, cohort):
+    checkpoint = run_cohort_job(cohort, protocols, tmp_path, shard_size=6, workers=2,
+                                output_format="csv", progress=lambda done, total: None)
+    assert sorted(checkpoint["completed"]) == [0, 1, 2, 3]
+
+    rows = read_rows(tmp_path)
+    patient = cohort[3]
+    plan = generate_weekly_plan(ProtocolScorer(patient, protocols).score_all_protocols(0.6, 0.3))
+    expected = [(day, p["protocol_id"]) for day, scheduled in plan.items() for p in scheduled]
+    assert [(r["day"], r["protocol_id"]) for r in rows if r["patient_id"] == patient.patient_id] == expected
+
+def test_cohort_job_resumes_from_checkpoint(tmp_path, protocols, cohort):
+    run_cohort_job(cohort, protocols, tmp_path, shard_size=6, output_format="csv",
+                   progress=lambda done, total: None)
+    checkpoint_path = tmp_path / CHECKPOINT_FILE
+    checkpoint = json.loads(checkpoint_path.read_text())
+    checkpoint["completed"].remove(2)
+    checkpoint_path.write_text(json.dumps(checkpoint))
+
+    reported = []
+    run_cohort_job(cohort, protocols, tmp_path, shard_size=6, output_format="csv",
+                   progress=lambda done, total: reported.append(done))
+    assert reported == [len(cohort)]
+
+    with pytest.raises(ValueError):
+        run_cohort_job(cohort, protocols, tmp_path, shard_size=5, output_format="csv")
@@ -0,0 +1,94 @@
+# tests/test_data_service.py
+from services.data_db import get_engine, reset_engine, session_scope
+from services.data_service import PatientRepository
+from utils.config import Settings
+
+def test_engine_is_created_lazily_from_settings(monkeypatch):
+    monkeypatch.setattr(Settings, "DATABASE_URL", "sqlite://")
+    reset_engine()
+    from services import data_db
+    assert data_db._engine is None
+    engine = get_engine()
+    assert engine is get_engine()
+    assert engine.url.get_backend_name() == "sqlite"
+    reset_engine()
+
+def test_repository_with_and_without_caller_session(sqlite_db):
+    assert PatientRepository().get_all_patient_ids() == ["1", "2"]
+    assert PatientRepository().get_patient("2").patient_user == "user2"
+
+    with session_scope() as session:
+        patients = PatientRepository(session).get_all_patients(lazy_load=False)
+        assert [len(p.prescriptions) for p in patients] == [2, 2]
+        assert patients[0].prescriptions[0].sessions[0].score == 100
+
+def test_iter_all_patients_streams_eager_loaded_batches(sqlite_db):
+    batches = list(PatientRepository().iter_all_patients(batch_size=1))
+    assert [[p.patient_id for p in batch] for batch in batches] == [[1], [2]]
+    # Detached, but the whole chain was loaded with its batch
+    assert batches[1][0].prescriptions[1].sessions[2].duration == 450
+
+    with session_scope() as session:
+        repository = PatientRepository(session)
+        for batch in repository.iter_all_patients(batch_size=2):
+            assert len(batch) == 2
+        assert len(session.identity_map) == 0
+
+def test_session_metrics_match_orm_properties(sqlite_db):
+    metrics = PatientRepository().get_session_metrics(patient_id="1")
+    assert len(metrics) == 6
+
+    with session_scope() as session:
+        patient = PatientRepository(session).get_all_patients(lazy_load=False)[0]
+        expected = {
+            s.session_id: (s.score, s.duration, s.adherence)
+            for prescription in patient.prescriptions for s in prescription.sessions
+        }
+    assert {m.session_id: (m.score, m.duration, m.adherence) for m in metrics} == expected
+    assert all(m.patient_id == 1 and m.errors is not None and m.successes is not None for m in metrics)
+
+    only = PatientRepository().get_session_metrics(session_ids=[100, 211])
+    assert [m.session_id for m in only] == [100, 211]
+
+def test_recording_index_is_built_once_and_invalidated(sqlite_db):
+    from services.data_db import RecordingKey, SessionRecording
+
+    with session_scope() as session:
+        patient = PatientRepository(session).get_all_patients(lazy_load=False)[0]
+        patient_session = patient.prescriptions[0].sessions[1]
+        assert (patient_session.score, patient_session.duration, patient_session.adherence) == (200, 300, 1.0)
+        index = patient_session.recording_index
+        assert patient_session.model_dump()["score"] == 200
+        assert patient_session.recording_index is index
+
+        patient_session.recordings[0].recording_value = 250
+        assert patient_session.score == 250
+
+        patient_session.recordings.append(SessionRecording(
+            recording_id=9999, protocol_id=200, recording_key=RecordingKey.SESSION_DURATION, recording_value=10,
+        ))
+        assert patient_session.duration == 300  # first recording of a key wins
+        original = next(r for r in patient_session.recordings if r.recording_id != 9999
+                        and r.recording_key == RecordingKey.SESSION_DURATION.value)
+        patient_session.recordings.remove(original)
+        assert patient_session.duration == 10
+        session.rollback()
+        assert patient_session.score == 200
+
+def test_usage_aggregates_per_prescription_and_week(sqlite_db):
+    from datetime import date, datetime
+
+    usage = PatientRepository().get_prescription_usage(patient_id="1")
+    assert [(u.prescription_id, u.sessions_done, u.total_duration) for u in usage] == [(10, 3, 900), (11, 3, 900)]
+    assert usage[0].mean_adherence == 1.0 and usage[0].mean_score == 200
+
+    weekly = PatientRepository().get_weekly_usage(prescription_ids=[21])
+    assert [(w.week_start, w.iso_week, w.sessions_done, w.total_duration) for w in weekly] == [
+        (date(2024, 2, 19), 8, 2, 450),
+        (date(2024, 2, 26), 9, 1, 450),
+    ]
+    assert weekly[0].patient_id == 2 and weekly[0].mean_adherence == 0.75 and weekly[0].mean_score == 150
+
+    later = PatientRepository().get_weekly_usage(start=datetime(2024, 2, 24))
+    assert {w.prescription_id for w in later} == {10, 11, 20, 21}
+    assert all(w.week_start == date(2024, 2, 26) for w in later)
@@ -0,0 +1,104 @@
+# tests/test_planning.py
+from datetime import date
+import pytest
+from pydantic import ValidationError
+from services.planning import PlanConfig, RollingPlan, WEEKDAYS, generate_weekly_plan
+from services.scoring import ProtocolScorer
+
+def make_protocol(protocol_id, protocol_type, max_daily_frequency=1, min_rest_period=0):
+    return {
+        "protocol_id": protocol_id,
+        "type": protocol_type,
+        "safety_constraints": {
+            "max_daily_frequency": max_daily_frequency,
+            "min_rest_period": min_rest_period,
+        },
+    }
+
+def days_used(plan, protocol_id):
+    return [i for i, day in enumerate(WEEKDAYS) for p in plan[day] if p["protocol_id"] == protocol_id]
+
+def test_plan_uses_distinct_protocols_in_score_order_first(protocols, patient):
+    scored = ProtocolScorer(patient, protocols).score_all_protocols(0.6, 0.3)
+    plan = generate_weekly_plan(scored)
+    motor_or_balanced = [p["protocol_id"] for p in scored if p["type"] in ("motor", "balanced")]
+    assert [p["protocol_id"] for p in plan["Monday"]] == motor_or_balanced[:4]
+    assert all(len(plan[day]) == 4 for day in WEEKDAYS)
+    assert any(p["type"] == "balanced" for day in WEEKDAYS for p in plan[day])
+    assert not any(p["type"] == "assessment" for day in WEEKDAYS for p in plan[day])
+
+def test_plan_honours_rest_period_and_daily_frequency():
+    scored = [
+        make_protocol("M1", "motor", min_rest_period=2),
+        make_protocol("M2", "motor", max_daily_frequency=2),
+        make_protocol("C1", "cognitive"),
+    ]
+    plan = generate_weekly_plan(scored, PlanConfig(slots_per_day=3))
+    assert days_used(plan, "M1") == [0, 3, 6]
+    assert days_used(plan, "M2")[:2] == [0, 0]
+    for day in WEEKDAYS:
+        ids = [p["protocol_id"] for p in plan[day]]
+        assert ids.count("M2") <= 2 and ids.count("M1") <= 1 and ids.count("C1") <= 1
+
+def test_plan_slots_and_balance_are_configurable():
+    scored = [make_protocol(f"M{i}", "motor") for i in range(20)] + [make_protocol(f"C{i}", "cognitive") for i in range(20)]
+    config = PlanConfig(slots_per_day=4, day_slots={"Sunday": 0}, focus_share=0.5)
+    plan = generate_weekly_plan(scored, config)
+    assert plan["Sunday"] == []
+    assert [p["type"] for p in plan["Monday"]] == ["motor", "motor", "cognitive", "cognitive"]
+    assert [p["type"] for p in plan["Tuesday"]] == ["cognitive", "cognitive", "motor", "motor"]
+
+def test_focus_cycle_is_validated_and_balanced_days_take_the_best_ranked():
+    for cycle in ([], ["assessment"], ["motor", "assessment"]):
+        with pytest.raises(ValidationError):
+            PlanConfig(focus_cycle=cycle)
+
+    scored = [make_protocol("C1", "cognitive"), make_protocol("M1", "motor"), make_protocol("B1", "balanced"),
+              make_protocol("M2", "motor"), make_protocol("C2", "cognitive")]
+    plan = generate_weekly_plan(scored, PlanConfig(slots_per_day=3, focus_cycle=["balanced", "motor"]))
+    assert [p["protocol_id"] for p in plan["Monday"]] == ["C1", "M1", "B1"]
+    assert [p["protocol_id"] for p in plan["Tuesday"]] == ["M2", "M1", "B1"]
+
+def assert_plan_valid(plan):
+    constraints = plan._constraints()
+    # Logged sessions and pinned days are facts/decisions the planner works around
+    for offset in range(len(plan.days)):
+        if plan._replannable(offset):
+            assert not plan._violates_constraints(offset, constraints), offset
+
+def rolling_protocols():
+    return (
+        [make_protocol(f"M{i}", "motor", min_rest_period=i % 3) for i in range(6)]
+        + [make_protocol(f"C{i}", "cognitive", min_rest_period=1) for i in range(5)]
+    )
+
+def test_rolling_plan_honours_rest_across_weeks_and_round_trips():
+    plan = RollingPlan.create(rolling_protocols(), date(2024, 2, 19), weeks=12)
+    assert len(plan.days) == 84 and plan.end_date == date(2024, 5, 12)
+    assert all(len(day) == 4 for day in plan.days)
+    assert_plan_valid(plan)
+    assert RollingPlan.model_validate_json(plan.model_dump_json()) == plan
+
+def test_editing_one_day_only_replans_days_within_rest_reach():
+    plan = RollingPlan.create(rolling_protocols(), date(2024, 2, 19), weeks=12)
+    before = [list(day) for day in plan.days]
+    edited = date(2024, 3, 4)  # offset 14
+    replanned = plan.edit_day(edited, ["M2", "M2", "C0"])
+    assert plan.plan_for(edited) == ["M2", "M2", "C0"]
+    assert all(15 <= offset <= 14 + 2 * 4 for offset in replanned)
+    assert plan.days[:14] == before[:14] and plan.days[30:] == before[30:]
+    assert 14 in plan.pinned
+
+def test_logged_session_and_new_scores_replan_locally():
+    plan = RollingPlan.create(rolling_protocols(), date(2024, 2, 19), weeks=12)
+    before = [list(day) for day in plan.days]
+    plan.record_session("M2", date(2024, 2, 20))
+    assert plan.plan_for(date(2024, 2, 20)) == ["M2"]
+    assert "M2" not in plan.days[2] and "M2" not in plan.days[3]
+    assert_plan_valid(plan)
+
+    reranked = list(reversed(rolling_protocols()))
+    replanned = plan.update_scores(reranked, date(2024, 3, 18))
+    assert set(range(28, 35)) <= set(replanned) and max(replanned) <= 34 + 2 * 4
+    assert plan.days[40:] == before[40:]
+    assert_plan_valid(plan)
@@ -0,0 +1,52 @@
+# tests/test_query_stats.py
+from services.data_db import get_engine, session_scope
+from services.data_service import PatientRepository
+from services.query_stats import instrument, normalize_statement, track_queries, uninstrument
+
+def test_normalize_statement_collapses_literals_and_in_lists():
+    assert normalize_statement("SELECT *\n  FROM t WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10") == \
+        "SELECT * FROM t WHERE id IN (?) AND name = ? LIMIT ?"
+    assert normalize_statement("SELECT a FROM t WHERE id IN (__[POSTCOMPILE_id_1])") == \
+        "SELECT a FROM t WHERE id IN (?)"
+
+def test_lazy_loading_in_a_loop_is_flagged(sqlite_db):
+    engine = instrument(get_engine())
+    try:
+        with track_queries("lazy", n_plus_one_threshold=3) as lazy:
+            with session_scope() as session:
+                for patient in PatientRepository(session).get_all_patients():
+                    for prescription in patient.prescriptions:
+                        prescription.sessions
+        assert lazy.queries == 1 + 2 + 4
+        suspects = lazy.suspected_n_plus_one()
+        assert [s.count for s in suspects] == [4]
+        assert "session_plus" in suspects[0].statement
+
+        with track_queries("eager", n_plus_one_threshold=3) as eager:
+            PatientRepository().get_all_patients(lazy_load=False)
+        assert eager.queries == 4 and not eager.suspected_n_plus_one()
+        summary = eager.summary()
+        assert summary["distinct_statements"] == 4 and summary["elapsed_ms"] >= summary["query_ms"]
+
+        # Outside a tracked block nothing is recorded
+        PatientRepository().get_all_patient_ids()
+        assert eager.queries == 4
+    finally:
+        uninstrument(engine)
+
+def test_failed_statements_do_not_leak_start_times(sqlite_db):
+    from sqlalchemy import text
+    engine = instrument(get_engine())
+    try:
+        with track_queries("errors") as stats:
+            with engine.connect() as conn:
+                for _ in range(3):
+                    try:
+                        conn.execute(text("SELECT * FROM missing_table"))
+                    except Exception:
+                        conn.rollback()
+                assert not conn.info.get("query_stats_start")
+                conn.execute(text("SELECT 1"))
+        assert stats.queries == 1
+    finally:
+        uninstrument(engine)
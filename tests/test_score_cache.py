@@ -0,0 +1,62 @@
+# tests/test_score_cache.py
+from services.protocol_index import ProtocolFeatureIndex
+from services.score_cache import ScoreCache
+from services.scoring import ProtocolScorer
+from utils.cache import LRUCache
+
+def test_repeated_lookup_is_a_hit(protocols, patient):
+    cache = ScoreCache()
+    index = ProtocolFeatureIndex(protocols)
+    first = cache.get_or_score(patient, index, 0.6, 0.3)
+    second = cache.get_or_score(patient, index, 0.6, 0.3)
+    assert second == first
+    assert first == ProtocolScorer(patient, index).score_all_protocols(0.6, 0.3)
+    assert cache.stats()["hits"] == 1
+
+def test_lookups_hand_out_independent_copies(protocols, patient):
+    cache = ScoreCache()
+    index = ProtocolFeatureIndex(protocols)
+    first = cache.get_or_score(patient, index, 0.6, 0.3, k=3)
+    first[0]["safety_constraints"]["contraindications"].append("edited")
+    first[0]["body_targets"]["arm"] = -1
+    assert cache.get_or_score(patient, index, 0.6, 0.3, k=3) == ProtocolScorer(patient, index).top_k(3, 0.6, 0.3)
+    assert index.payload(index.position(first[0]["protocol_id"])) == \
+        protocols[index.position(first[0]["protocol_id"])].model_dump()
+
+def test_changed_scores_only_invalidate_that_patient(protocols, patient, cohort):
+    cache = ScoreCache()
+    index = ProtocolFeatureIndex(protocols)
+    other = cohort[0]
+    cache.get_or_score(patient, index, 0.6, 0.3)
+    cache.get_or_score(patient, index, 0.5, 0.5)
+    other_scores = cache.get_or_score(other, index, 0.6, 0.3)
+
+    patient.clinical_scores.ARAT.grasp = 18
+    updated = cache.get_or_score(patient, index, 0.6, 0.3)
+    assert updated == ProtocolScorer(patient, index).score_all_protocols(0.6, 0.3)
+    # Two rankings and the scorer of the changed patient
+    assert cache.stats()["invalidations"] == 3
+    assert cache.get_or_score(other, index, 0.6, 0.3) == other_scores
+
+def test_lru_evicts_least_recently_used():
+    evicted = []
+    cache = LRUCache(maxsize=2, on_evict=lambda key, value: evicted.append(key))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert evicted == ["b"]
+    assert "a" in cache and "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+def test_weight_change_reuses_scorer(protocols, patient, monkeypatch):
+    cache = ScoreCache()
+    index = ProtocolFeatureIndex(protocols)
+    cache.get_or_score(patient, index, 0.6, 0.3)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("similarities recomputed")
+    monkeypatch.setattr("services.score_cache.ProtocolScorer", fail)
+    reranked = cache.get_or_score(patient, index, 0.2, 0.9)
+    monkeypatch.undo()
+    assert reranked == ProtocolScorer(patient, index).score_all_protocols(0.2, 0.9)
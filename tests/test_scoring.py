@@ -1,8 +1,103 @@
-# tests/test_scoring.py
-from services.data_service import PatientRepository
-
-def test_motor_scoring():
-    patient = PatientRepository().get_patient("P001")
-    # protocol = ProtocolRepository().get_protocol("PR200")
-    # scorer = ProtocolScorer(patient, protocol)
-    # assert 15 <= scorer.calculate_deficit_match() <= 20
\ No newline at end of file
+# tests/test_scoring.py
+import warnings
+import numpy as np
+import pytest
+from services.scoring import ProtocolScorer, CohortScorer, select_top_k, filter_protocols, weight_grid
+from services.protocol_index import ProtocolFeatureIndex
+from services.data_service import PatientRepository
+
+def test_motor_scoring():
+    patient = PatientRepository().get_patient("P001")
+    # protocol = ProtocolRepository().get_protocol("PR200")
+    # scorer = ProtocolScorer(patient, protocol)
+    # assert 15 <= scorer.calculate_deficit_match() <= 20
+
+def test_cohort_scores_match_single_patient_scoring(protocols, cohort):
+    scorer = CohortScorer(protocols)
+    scores = scorer.score_matrix(cohort, 0.6, 0.3)
+    assert scores.shape == (len(cohort), len(protocols))
+
+    for row, patient in enumerate(cohort):
+        expected = {
+            p["protocol_id"]: p["score"]
+            for p in ProtocolScorer(patient, protocols).score_all_protocols(0.6, 0.3)
+        }
+        for col, protocol in enumerate(protocols):
+            if protocol.protocol_id in expected:
+                assert np.isclose(scores[row, col], expected[protocol.protocol_id])
+
+def test_score_cohort_applies_contraindications(protocols, patient):
+    patient.tags = ["severe_neglect"]
+    ranked = CohortScorer(protocols).score_cohort([patient], 0.6, 0.3)
+    assert ranked[patient.patient_id] == []
+
+def test_score_all_protocols_matches_feature_dot_products(protocols, patient):
+    scorer = ProtocolScorer(patient, protocols)
+    scored = scorer.score_all_protocols(0.6, 0.3)
+    assert len(scored) == len(scorer.protocols)
+    for result in scored:
+        protocol = next(p for p in protocols if p.protocol_id == result["protocol_id"])
+        motor, motor_contributions = scorer._calculate_motor_similarity(protocol)
+        cognitive, cognitive_contributions = scorer._calculate_cognitive_similarity(protocol)
+        assert np.isclose(result["score"], motor * 0.6 + cognitive * 0.3)
+        assert result["motor_contributions"] == motor_contributions
+        assert result["cognitive_contributions"] == cognitive_contributions
+
+def test_protocol_index_is_immutable_and_versioned(protocols, patient):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        index = ProtocolFeatureIndex(protocols)
+        ProtocolScorer(patient, index).score_all_protocols(0.6, 0.3)
+    assert len(index) == len(protocols)
+    assert index.features.shape == (12, len(protocols))
+    assert not index.features.flags.writeable
+    with pytest.raises(AttributeError):
+        index.version = "other"
+    assert ProtocolFeatureIndex(protocols).version == index.version
+    assert ProtocolFeatureIndex(protocols[1:]).version != index.version
+    assert index.payload(index.position("PR200"))["name"] == protocols[index.position("PR200")].name
+
+def test_top_k_is_head_of_full_ranking(protocols, patient):
+    scorer = ProtocolScorer(patient, protocols)
+    full = scorer.score_all_protocols(0.6, 0.3)
+    for k in (0, 1, 5, len(full), len(full) + 3):
+        top = scorer.top_k(k, 0.6, 0.3)
+        assert [p["protocol_id"] for p in top] == [p["protocol_id"] for p in full[:k]]
+        assert all("motor_contributions" not in p for p in top)
+    explained = scorer.top_k(3, 0.6, 0.3, explain=True)
+    assert explained == full[:3]
+
+def test_select_top_k_breaks_ties_by_position():
+    scores = np.array([1.0, 3.0, 2.0, 3.0, 2.0, 2.0])
+    assert select_top_k(scores, 4).tolist() == [1, 3, 2, 4]
+
+def test_contraindication_index_matches_tag_membership(protocols, cohort):
+    index = ProtocolFeatureIndex(protocols)
+    cohort[0].tags = ["severe_neglect"]
+    allowed = CohortScorer(index).allowed_matrix(cohort)
+    for patient, row in zip(cohort, allowed):
+        expected = [
+            not any(tag in p.safety_constraints.contraindications for tag in patient.tags)
+            for p in protocols
+        ]
+        assert row.tolist() == expected
+        assert filter_protocols(index, patient) == [p for p, ok in zip(protocols, expected) if ok]
+        assert filter_protocols(protocols, patient) == [p for p, ok in zip(protocols, expected) if ok]
+    assert not allowed[0].any()
+
+    masked = CohortScorer(index).score_matrix(cohort, 0.6, 0.3, apply_contraindications=True)
+    assert np.isneginf(masked[0]).all()
+
+def test_sweep_weights_matches_per_pair_scoring(protocols, patient):
+    scorer = ProtocolScorer(patient, protocols)
+    grid = weight_grid([0.0, 0.5, 1.0], [0.0, 0.3, 1.0])
+    sweep = scorer.sweep_weights(grid, k=3)
+    assert sweep.scores.shape == (9, len(scorer.protocols))
+
+    for row, (motor_weight, cognitive_weight) in enumerate(sweep.weights):
+        expected = scorer.top_k(3, motor_weight, cognitive_weight)
+        assert sweep.top_k[row] == [p["protocol_id"] for p in expected]
+    for i in sweep.change_points:
+        assert set(sweep.top_k[i]) != set(sweep.top_k[i - 1])
+    assert 0 < sweep.stability <= 1
+    assert all(0 < share <= 1 for share in sweep.top_k_frequency.values())
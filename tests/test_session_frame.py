@@ -0,0 +1,89 @@
+# tests/test_session_frame.py
+import json
+import random
+import sys
+
+import numpy as np
+import pytest
+
+from models.patient import PatientSessions, ProtocolSessions, WeeklyPrescription
+from models.session_frame import SessionFrame
+from utils.mock_data import generate_random_history
+
+def deep_size(obj, seen):
+    """Recursive sys.getsizeof, counting each object once"""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+def test_frame_round_trips_sessions(history_patient):
+    sessions = history_patient.sessions
+    frame = SessionFrame.from_sessions(sessions)
+    assert len(frame) == len(sessions)
+    assert frame.categories["protocol_id"] == ("PR1", "PR2", "PR3")
+    assert frame.adherence.tolist() == [s.adherence for s in sessions]
+    prescriptions = {p.prescription_id: p for p in history_patient.prescriptions}
+    assert [s.model_dump() for s in frame.to_sessions(prescriptions)] == [s.model_dump() for s in sessions]
+
+    halves = SessionFrame.concat([frame.take(slice(10, None)), frame.take(slice(0, 10))])
+    assert halves.session_ids() == [s.session_id for s in sessions[10:] + sessions[:10]]
+    assert halves.ids("protocol_id").tolist() == [s.protocol_id for s in sessions[10:] + sessions[:10]]
+    assert SessionFrame.from_dict(json.loads(json.dumps(frame.to_dict(), default=str))).to_dict() == frame.to_dict()
+
+def test_frame_is_an_order_of_magnitude_smaller_than_the_models():
+    random.seed(5)
+    prescriptions, sessions = generate_random_history("P001", ["PR1", "PR2", "PR3"], weeks=52)
+    frame = SessionFrame.from_sessions(sessions)
+    # Category strings included; the prescriptions the models point to are shared, so left out
+    models_size = deep_size(sessions, {id(p) for p in prescriptions})
+    assert frame.nbytes * 10 <= models_size
+
+def test_frame_columns_are_read_only(history_patient):
+    frame = SessionFrame.from_sessions(history_patient.sessions)
+    for column in (frame.duration, frame.session_id, frame.timestamp, frame.codes["protocol_id"],
+                   frame.take(slice(0, 5)).adherence):
+        with pytest.raises(ValueError):
+            column[0] = column[1]
+    with pytest.raises(AttributeError):
+        frame.duration = frame.duration * 2
+
+def test_aggregators_give_the_same_results_for_frames(history_patient):
+    sessions = history_patient.sessions
+    frame = SessionFrame.from_sessions(sessions)
+
+    from_list, from_frame = WeeklyPrescription(patient_id="P"), WeeklyPrescription(patient_id="P")
+    for prescription in history_patient.prescriptions:
+        from_list.add_data(prescription, sessions)
+        from_frame.add_data(prescription, frame)
+    assert list(from_frame.weekly_data) == list(from_list.weekly_data)
+    for week, data in from_list.weekly_data.items():
+        assert from_frame.weekly_data[week]["sessions"].session_ids() == [s.session_id for s in data["sessions"]]
+
+    protocols_list, protocols_frame = ProtocolSessions(patient_id="P"), ProtocolSessions(patient_id="P")
+    protocols_list.add_sessions(sessions)
+    protocols_frame.add_sessions(frame.take(slice(0, 7)))
+    protocols_frame.add_sessions(frame.take(slice(7, None)))
+    assert protocols_frame.protocol_scores == protocols_list.protocol_scores
+    assert protocols_frame.get_ewma_metrics("PR1", alpha=0.6) == protocols_list.get_ewma_metrics("PR1", alpha=0.6)
+
+    cross_list, cross_frame = PatientSessions(protocol_id="PR2"), PatientSessions(protocol_id="PR2")
+    cross_list.add_patient_sessions("P", sessions)
+    cross_frame.add_patient_sessions("P", frame)
+    assert np.isclose(cross_frame.average_performance, cross_list.average_performance)
+    assert np.isclose(cross_frame.average_adherence, cross_list.average_adherence)
+    assert json.loads(cross_frame.model_dump_json())["patient_stats"]["P"]["num_sessions"] == \
+        cross_list.patient_stats["P"]["num_sessions"]
+
+def test_patient_session_frame_is_memoized(history_patient):
+    frame = history_patient.session_frame
+    assert history_patient.session_frame is frame
+    history_patient.sessions = history_patient.sessions[:5]
+    assert len(history_patient.session_frame) == 5
@@ -0,0 +1,63 @@
+# tests/test_snapshot_sync.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from services.data_db import PatientSession, SessionRecording, build_engine, get_engine, session_scope
+from services.snapshot_sync import get_watermarks, sync_snapshot
+
+def test_snapshot_copies_everything_then_only_new_rows(sqlite_db, tmp_path):
+    target = build_engine(f"sqlite:///{tmp_path / 'snapshot.db'}")
+    first = sync_snapshot(get_engine(), target, batch_size=7, refresh_window=None)
+    assert first == {"patient": 2, "prescription_plus": 4, "session_plus": 12, "recording_plus": 48}
+    assert get_watermarks(target)["session_plus"]["last_id"] == 212
+
+    with session_scope() as session:
+        session.add(PatientSession(
+            session_id=300, prescription_id=21, starting_date=datetime(2024, 3, 4),
+            ending_date=datetime(2024, 3, 4, 0, 5), status="CLOSED", platform="RGS", device="TABLET",
+            session_log_parsed=True,
+        ))
+        session.add(SessionRecording(recording_id=3000, session_id=300, protocol_id=201,
+                                     recording_key="score", recording_value=7))
+
+    second = sync_snapshot(get_engine(), target, refresh_window=None)
+    assert second == {"patient": 0, "prescription_plus": 0, "session_plus": 1, "recording_plus": 1}
+    watermarks = get_watermarks(target)
+    assert watermarks["recording_plus"]["last_id"] == 3000
+    assert watermarks["recording_plus"]["rows_synced"] == 49
+
+    rebuilt = sync_snapshot(get_engine(), target, full=True)
+    assert rebuilt["recording_plus"] == 49
+
+def test_snapshot_refreshes_rows_edited_within_the_window(sqlite_db, tmp_path):
+    target = build_engine(f"sqlite:///{tmp_path / 'snapshot.db'}")
+    sync_snapshot(get_engine(), target, refresh_window=timedelta(days=3))
+    assert get_watermarks(target)["session_plus"]["last_date"] == datetime(2024, 2, 27, 10)
+
+    # Correct the duration of a last-week session (day 8) and of a first-day session
+    with session_scope() as session:
+        session.get(SessionRecording, 1021).recording_value = 333
+        session.get(SessionRecording, 1001).recording_value = 111
+
+    second = sync_snapshot(get_engine(), target, batch_size=3, refresh_window=timedelta(days=3))
+    # Sessions from day 5 on (one per prescription), their recordings and the open prescriptions
+    assert second == {"patient": 0, "prescription_plus": 4, "session_plus": 4, "recording_plus": 16}
+    with target.connect() as conn:
+        values = dict(conn.execute(select(SessionRecording.recording_id, SessionRecording.recording_value)
+                                   .where(SessionRecording.recording_id.in_([1001, 1021]))).all())
+    assert values == {1021: 333, 1001: 150}
+    assert get_watermarks(target)["recording_plus"]["rows_synced"] == 48
+
+def test_snapshot_serves_repository_queries(sqlite_db, tmp_path, monkeypatch):
+    from services.data_db import reset_engine
+    from services.data_service import PatientRepository
+    from utils.config import Settings
+
+    expected = PatientRepository().get_weekly_usage("1")
+    snapshot_url = f"sqlite:///{tmp_path / 'snapshot.db'}"
+    sync_snapshot(get_engine(), build_engine(snapshot_url))
+
+    monkeypatch.setattr(Settings, "DATABASE_URL", snapshot_url)
+    reset_engine()
+    assert PatientRepository().get_weekly_usage("1") == expected
@@ -0,0 +1,99 @@
+# utils/cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU mapping with hit/miss/eviction counters.
+
+    Entries may expire: `ttl` (seconds) is the default lifetime, and `put` can
+    override it per entry. An expired entry is dropped on access and counts as a miss.
+    """
+    def __init__(self, maxsize: int = 256, on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+                 ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.ttl = ttl
+        self.clock = clock
+        # key -> (value, expiry time or None)
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Value for key (marking it most recently used), counting the hit or miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry):
+                self._expire(key, entry)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Insert or refresh key, evicting the least recently used entries beyond maxsize"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, None if ttl is None else self.clock() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted_key, (evicted_value, _) = self._data.popitem(last=False)
+                self.evictions += 1
+                if self.on_evict:
+                    self.on_evict(evicted_key, evicted_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key explicitly (counted as an invalidation, not an eviction)"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self.invalidations += 1
+            return entry[0]
+
+    def _expired(self, entry: Tuple[Any, Optional[float]]) -> bool:
+        return entry[1] is not None and entry[1] <= self.clock()
+
+    def _expire(self, key: Hashable, entry: Tuple[Any, Optional[float]]):
+        del self._data[key]
+        self.expirations += 1
+        if self.on_evict:
+            self.on_evict(key, entry[0])
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring (hits, misses, evictions, invalidations, size)"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
@@ -1,11 +1,13 @@
 import json
 import random
-from datetime import datetime
-from typing import List, Dict, Any
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Tuple
 from pydantic import BaseModel, Field
 from pathlib import Path
 
 from models.patient import StrokeInfo, ARAT, MoCA, ClinicalScores, RecoveryProfile, Patient
+from models.protocol import Protocol, ProtocolType, MotorFeatures, CognitiveFeatures, BodyTargets, Gamification, SafetyConstraints
+from models.session import Prescription, Session
 
 def generate_random_patient(patient_id: str) -> Patient:
     """Generates a random patient profile based on Pydantic models."""
@@ -71,6 +73,76 @@ def generate_random_patient(patient_id: str) -> Patient:
         tags=tags
     )
 
+def generate_random_protocol(protocol_id: str) -> Protocol:
+    """Generates a random protocol with binary motor/cognitive features."""
+    levels = ["low", "mid", "high"]
+    motor_features = MotorFeatures(
+        reaching=random.random() < 0.5,
+        grasping=random.random() < 0.5,
+        pinching=random.random() < 0.5,
+        pronation_supination=random.random() < 0.3,
+        range_of_motion_h=random.choice(levels),
+        range_of_motion_v=random.choice(levels)
+    )
+    cognitive_features = CognitiveFeatures(
+        **{name: random.random() < 0.4 for name in CognitiveFeatures.model_fields}
+    )
+    contraindications = random.sample(["severe_neglect", "high_risk", "mild_neglect", "low_motivation"], random.randint(0, 2))
+
+    return Protocol(
+        protocol_id=protocol_id,
+        name=f"Synthetic {protocol_id}",
+        type=random.choice([ProtocolType.MOTOR, ProtocolType.COGNITIVE, ProtocolType.BALANCED]),
+        difficulty_cognitive=random.choice(levels),
+        difficulty_motor=random.choice(levels),
+        body_targets=BodyTargets(**{part: random.randint(0, 1) for part in BodyTargets.model_fields}),
+        motor_features=motor_features,
+        cognitive_features=cognitive_features,
+        cognitive_demand=random.uniform(0, 1),
+        gamification=Gamification(type=random.choice(["AR", "VR"]), feedback_modes=["visual"]),
+        safety_constraints=SafetyConstraints(
+            max_duration=random.choice([15, 25, 40]),
+            contraindications=contraindications,
+            max_daily_frequency=random.randint(1, 2),
+            min_rest_period=random.randint(0, 2)
+        )
+    )
+
+def generate_random_history(patient_id: str, protocol_ids: List[str], weeks: int = 4,
+                            start_date: date = date(2024, 2, 19)) -> Tuple[List[Prescription], List[Session]]:
+    """Generates weekly prescriptions and the sessions performed for them."""
+    prescriptions = []
+    sessions = []
+    weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    for i, protocol_id in enumerate(protocol_ids):
+        weekday = i % 7
+        prescription = Prescription(
+            prescription_id=f"{patient_id}-PRESC{i+1:04d}",
+            patient_id=patient_id,
+            protocol_id=protocol_id,
+            start_date=start_date,
+            end_date=start_date + timedelta(weeks=weeks, days=-1),
+            weekday=weekdays[weekday],
+            prescribed_duration=random.randint(30, 60)
+        )
+        prescriptions.append(prescription)
+        for week in range(weeks):
+            if random.random() < 0.8:  # Missed sessions lower adherence
+                session = Session(
+                    session_id=f"{patient_id}-S{len(sessions)+1:06d}",
+                    patient_id=patient_id,
+                    protocol_id=protocol_id,
+                    prescription_id=prescription.prescription_id,
+                    timestamp=datetime.combine(start_date + timedelta(weeks=week, days=weekday), datetime.min.time())
+                              + timedelta(hours=random.randint(8, 18)),
+                    duration=random.uniform(15, 60),
+                    difficulty_modulator=random.uniform(0, 1),
+                    performance_score=random.uniform(0.5, 1.0)
+                )
+                session._prescription = prescription
+                sessions.append(session)
+    return prescriptions, sessions
+
 def save_patient_to_json(patient: Patient, filename: str):
     """Saves the patient profile to a JSON file."""
     with open(filename, "w", encoding="utf-8") as f: